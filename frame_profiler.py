@@ -0,0 +1,189 @@
+import csv
+import gc
+import json
+import os
+import sys
+import time
+from collections import deque
+
+
+# Percentil (najbliži rang) već sortirane liste
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100. * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+# Mjerač jednog imenovanog dijela sličice; stvara se jednom i ponovno koristi,
+# a izmjereno vrijeme dodaje se trenutnoj sličici
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        frame = self.profiler.frame_scopes
+        frame[self.name] = frame.get(self.name, 0.) + (time.perf_counter() - self.start)
+        return False
+
+
+# Mjerenje sličica: trajanja dijelova sličice, brojači po sličici i percentili
+# p50/p95/p99 zadnjih window sličica. Pauze skupljača smeća mjere se kao dio "gc",
+# a uz svaku sličicu bilježi se broj skupljanja (gc_collections) i promjena broja
+# živih memorijskih blokova interpretera (alloc_blocks).
+# Uz trace_path svaka sličica odmah se zapisuje u datoteku: .jsonl kao jedan JSON
+# objekt po sličici, a ostalo (.csv) kao CSV redci (sličica, ime, vrijednost), pa se
+# ništa ne skuplja u memoriji, a nova mjerenja mogu se pojaviti u bilo kojoj sličici.
+class FrameProfiler:
+    def __init__(self, window=300, trace_path=None, hud_interval=15):
+        self.window = window
+        self.hud_interval = hud_interval # HUD se osvježava svakih hud_interval sličica
+        self.hud_cache = []
+        self.frame_scopes = {}
+        self.frame_counters = {}
+        self.last_counters = {}
+        self.history = {}
+        self.scopes = {}
+        self.frame_index = 0
+        self.frame_start = time.perf_counter()
+        self.hud_visible = True
+        self.trace_file = self.trace_writer = None
+        if trace_path and trace_path.endswith(".jsonl"):
+            self.trace_file = open(trace_path, "w")
+        elif trace_path:
+            self.trace_file = open(trace_path, "w", newline="")
+            self.trace_writer = csv.writer(self.trace_file)
+            self.trace_writer.writerow(("frame", "name", "value"))
+        self.gc_start = 0.
+        self.frame_blocks = sys.getallocatedblocks()
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_start = time.perf_counter()
+        else:
+            self.frame_scopes["gc"] = self.frame_scopes.get("gc", 0.) + (time.perf_counter() - self.gc_start)
+            self.count("gc_collections")
+
+    # Mjerač za blok koda; više mjerenja istog imena u sličici se zbraja
+    def scope(self, name):
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = _Scope(self, name)
+        return scope
+
+    def count(self, name, value=1):
+        self.frame_counters[name] = self.frame_counters.get(name, 0) + value
+
+    # Kraj sličice: bilježi njeno trajanje, dijelove i brojače, pa ih poništava
+    def end_frame(self):
+        now = time.perf_counter()
+        frame_ms = (now - self.frame_start) * 1000.
+        self.frame_start = now
+        blocks = sys.getallocatedblocks()
+        self.frame_counters.setdefault("gc_collections", 0)
+        self.frame_counters["alloc_blocks"] = blocks - self.frame_blocks
+        self.frame_blocks = blocks
+        self._record("frame", frame_ms)
+        scopes_ms = {name: value * 1000. for name, value in self.frame_scopes.items()}
+        for name, value in scopes_ms.items():
+            self._record(name, value)
+        if self.trace_file is not None:
+            self._trace(frame_ms, scopes_ms)
+        self.frame_index += 1
+        self.frame_scopes = {}
+        self.last_counters, self.frame_counters = self.frame_counters, {}
+
+    def _record(self, name, value):
+        values = self.history.get(name)
+        if values is None:
+            values = self.history[name] = deque(maxlen=self.window)
+        values.append(value)
+
+    def _trace(self, frame_ms, scopes_ms):
+        row = {"frame": self.frame_index, "frame_ms": round(frame_ms, 4)}
+        row.update((name, round(value, 4)) for name, value in scopes_ms.items())
+        row.update(self.frame_counters)
+        if self.trace_writer is not None:
+            self.trace_writer.writerows((self.frame_index, name, value) for name, value in row.items()
+                                        if name != "frame")
+        else:
+            self.trace_file.write(json.dumps(row) + "\n")
+
+    # (p50, p95, p99) u milisekundama za dio sličice ili za "frame"
+    def percentiles(self, name):
+        values = sorted(self.history.get(name, ()))
+        return tuple(percentile(values, q) for q in (50, 95, 99))
+
+    def hud_lines(self):
+        if self.hud_cache and self.frame_index % self.hud_interval:
+            return self.hud_cache
+        lines = ["%-12s p50 %6.2f  p95 %6.2f  p99 %6.2f ms" % ((name,) + self.percentiles(name))
+                 for name in self.history]
+        lines.extend("%-12s %s" % item for item in self.last_counters.items())
+        self.hud_cache = lines
+        return lines
+
+    def toggle_hud(self):
+        self.hud_visible = not self.hud_visible
+
+    def close(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        if self.trace_file is not None:
+            self.trace_file.close()
+            self.trace_file = self.trace_writer = None
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# Isključeno mjerenje: isto sučelje, svaki poziv ne radi ništa
+class NullProfiler:
+    hud_visible = False
+    _scope = _NullScope()
+
+    def scope(self, name):
+        return self._scope
+
+    def count(self, name, value=1):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def percentiles(self, name):
+        return (0., 0., 0.)
+
+    def hud_lines(self):
+        return []
+
+    def toggle_hud(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# Mjerenje prema okolini: FRAME_PROFILE=1 uključuje mjerenje i HUD, a
+# FRAME_PROFILE_TRACE=put.csv ili put.jsonl zapisuje i svaku sličicu. Bez
+# FRAME_PROFILE vraća se NullProfiler, pa mjerenje ne košta ništa osim poziva.
+def create_profiler():
+    if os.environ.get("FRAME_PROFILE", "0") in ("", "0"):
+        return NullProfiler()
+    return FrameProfiler(trace_path=os.environ.get("FRAME_PROFILE_TRACE"))
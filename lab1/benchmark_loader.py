@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+from obj_loader import cache_path, load_obj, parse_obj
+
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+LEGACY_MAX_FACES = 20000 # Stari učitavač je kvadratičan, na većim mrežama traje predugo
+
+
+# Prijašnji učitavač (np.vstack za svaki redak), zadržan samo radi usporedbe
+def legacy_load(path):
+    points, faces = None, None
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split()
+            if parts[0] == 'v':
+                x, y, z = map(float, parts[1:4])
+                if points is None:
+                    points = np.array([[x, y, z]])
+                else:
+                    points = np.vstack((points, [x, y, z]))
+            elif parts[0] == 'f':
+                i1, i2, i3 = map(int, parts[1:4])
+                if faces is None:
+                    faces = np.array([[i1, i2, i3]])
+                else:
+                    faces = np.vstack((faces, [i1, i2, i3]))
+    return points, faces
+
+
+# Sintetska mreža: pravilna rešetka vrhova triangulirana s dva trokuta po ćeliji
+def write_synthetic_mesh(path, n_faces):
+    side = int(np.ceil(np.sqrt(n_faces / 2))) + 1
+    xs, ys = np.meshgrid(np.arange(side), np.arange(side))
+    verts = np.column_stack((xs.ravel(), ys.ravel(), np.sin(xs.ravel() * 0.1)))
+    idx = np.arange(side * side).reshape(side, side) + 1
+    a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+    c, d = idx[1:, :-1].ravel(), idx[1:, 1:].ravel()
+    faces = np.vstack((np.column_stack((a, b, c)), np.column_stack((b, d, c))))[:n_faces]
+    with open(path, 'w') as f:
+        np.savetxt(f, verts, fmt="v %.6f %.6f %.6f")
+        np.savetxt(f, faces, fmt="f %d %d %d")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def bench(path):
+    if os.path.exists(cache_path(path)):
+        os.remove(cache_path(path))
+    t_cold, (points, faces) = timed(parse_obj, path)
+    timed(load_obj, path) # Prvo pokretanje zapisuje predmemoriju
+    t_warm, _ = timed(load_obj, path)
+    if len(faces) <= LEGACY_MAX_FACES:
+        t_legacy = "%9.4f" % timed(legacy_load, path)[0]
+    else:
+        t_legacy = "  skipped"
+    print("%-14s %9d %9d %9.4f %9.4f %s" % (os.path.basename(path), len(points), len(faces),
+                                            t_cold, t_warm, t_legacy))
+
+
+if __name__ == "__main__":
+    n_synthetic = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("%-14s %9s %9s %9s %9s %9s" % ("mesh", "verts", "faces", "cold[s]", "warm[s]", "legacy[s]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        # Kopije se rade u privremeni direktorij kako se predmemorija ne bi pisala u assets
+        for name in ("bird.obj", "teddy.obj"):
+            copy = os.path.join(tmp, name)
+            with open(os.path.join(ASSETS, name), 'rb') as src, open(copy, 'wb') as dst:
+                dst.write(src.read())
+            bench(copy)
+        synthetic = os.path.join(tmp, "synthetic.obj")
+        write_synthetic_mesh(synthetic, n_synthetic)
+        bench(synthetic)
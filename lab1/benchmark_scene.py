@@ -0,0 +1,57 @@
+import argparse
+import os
+import time
+import numpy as np
+import pyglet
+
+parser = argparse.ArgumentParser(description="Vrijeme sličice u ovisnosti o broju instanci")
+parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 10000])
+parser.add_argument("--frames", type=int, default=100)
+parser.add_argument("--gl", action="store_true", help="mjeri i slanje na GPU i iscrtavanje (headless EGL)")
+args = parser.parse_args()
+
+if args.gl:
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    pyglet.options['headless'] = True
+
+from obj_loader import load_obj
+from scene import Scene
+from spline import B_SPLINE
+
+
+def build(count, rng):
+    scene = Scene(B_SPLINE)
+    base, _ = load_obj("assets/path.obj")
+    for _ in range(8):
+        scene.add_path(base + rng.normal(scale=0.05, size=base.shape))
+    scene.add_instances("bird", count, path=rng.integers(0, 8, count),
+                        phase=rng.uniform(0., 10., count), speed=rng.uniform(0.2, 0.6, count))
+    return scene
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    if args.gl:
+        from OpenGL.GL import glClear, glFinish, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+        from renderer import InstancedMesh
+        cfg = pyglet.gl.Config(double_buffer=True, depth_size=24, major_version=2, minor_version=1)
+        window = pyglet.window.Window(800, 600, config=cfg, visible=False)
+        points, faces = load_obj("assets/bird.obj")
+        mesh = InstancedMesh({"points": points / np.ptp(points, axis=0).max(), "faces": faces})
+    print("%10s %12s %12s" % ("instances", "update[ms]", "frame[ms]"))
+    for count in args.counts:
+        scene = build(count, rng)
+        scene.update(0.)
+        update_time = frame_time = 0.
+        for i in range(args.frames):
+            start = time.perf_counter()
+            scene.update(i / 60.)
+            update_time += time.perf_counter() - start
+            if args.gl:
+                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                mesh.upload_instances(scene.instance_data("bird"))
+                mesh.draw()
+                glFinish()
+            frame_time += time.perf_counter() - start
+        frame = "%12.3f" % (1000 * frame_time / args.frames) if args.gl else "%12s" % "-"
+        print("%10d %12.3f %s" % (count, 1000 * update_time / args.frames, frame))
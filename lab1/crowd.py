@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import numpy as np
+import pyglet
+
+parser = argparse.ArgumentParser(description="Mnoštvo objekata koji se kreću po B-splajn putanjama")
+parser.add_argument("--birds", type=int, default=300, help="broj instanci bird.obj")
+parser.add_argument("--teddies", type=int, default=50, help="broj instanci teddy.obj")
+parser.add_argument("--paths", type=int, default=8, help="broj nasumično pomaknutih kopija putanje")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--headless", action="store_true", help="renderiranje bez prozora i zaslona (EGL)")
+parser.add_argument("--frames", type=int, default=300, help="broj sličica u headless načinu")
+parser.add_argument("--fps", type=float, default=60., help="korak animacije po sličici je 1/fps sekundi")
+parser.add_argument("--out", default="frames", help="direktorij za PNG sličice ili '-' za sirovi RGBA tok na stdout")
+args = parser.parse_args()
+
+if args.headless:
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    pyglet.options['headless'] = True
+
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+from obj_loader import load_obj
+from spline import B_SPLINE
+from scene import Scene
+from renderer import InstancedMesh
+from headless import PngSink, RawSink, render_frames
+
+
+SCREEN_W, SCREEN_H = 1500, 800
+MESH_COLORS = {"bird": (0.9, 0.8, 0.3), "teddy": (0.2, 0.8, 0.3)}
+
+cfg = pyglet.gl.Config(double_buffer=True, depth_size=24, major_version=2, minor_version=1)
+app_window = pyglet.window.Window(SCREEN_W, SCREEN_H, config=cfg, visible=not args.headless)
+elapsed = 0.
+
+
+# Model normaliziran na jediničnu veličinu, kao load_model u main.py
+def load_normalized(path):
+    points, faces = load_obj(path)
+    return {"points": points / np.max(np.max(points, axis=0) - np.min(points, axis=0)), "faces": faces}
+
+
+def build_scene(rng):
+    scene = Scene(B_SPLINE)
+    base, _ = load_obj("assets/path.obj")
+    base = base / np.max(np.max(base, axis=0) - np.min(base, axis=0))
+    for i in range(args.paths):
+        # Svaka putanja je izvorna putanja s malim nasumičnim pomakom kontrolnih točaka
+        jitter = rng.normal(scale=0.05, size=base.shape) if i > 0 else 0.
+        scene.add_path(base + jitter)
+    for mesh, count in (("bird", args.birds), ("teddy", args.teddies)):
+        scene.add_instances(mesh, count, path=rng.integers(0, args.paths, count),
+                            phase=rng.uniform(0., 10., count), speed=rng.uniform(0.2, 0.6, count))
+    return scene, base
+
+
+def tick(dt):
+    global elapsed
+    elapsed += dt
+    scene.update(elapsed) # Svi položaji i orijentacije u jednom prolazu po modelu
+
+
+@app_window.event
+def on_draw():
+    glEnable(GL_DEPTH_TEST)
+    glClearColor(0., 0., 0.1, 1.)
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(10.0, float(SCREEN_W)/float(SCREEN_H), 0.1, 100.)
+    eye = center + np.array([1., 1., 4.])
+    gluLookAt(eye[0], eye[1], eye[2], center[0], center[1], center[2], 0., 0., 1.)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    for name, mesh in meshes.items(): # Jedan poziv iscrtavanja po vrsti modela
+        mesh.upload_instances(scene.instance_data(name))
+        glColor3f(*MESH_COLORS[name])
+        mesh.draw()
+
+
+if __name__ == "__main__":
+    scene, base = build_scene(np.random.default_rng(args.seed))
+    center = np.mean(base, axis=0)
+    meshes = {name: InstancedMesh(load_normalized("assets/%s.obj" % name), scale=0.03)
+              for name in ("bird", "teddy")}
+    scene.update(elapsed)
+    if args.headless:
+        sink = RawSink(sys.stdout.buffer) if args.out == "-" else PngSink(args.out)
+        render_frames(app_window, tick, on_draw, args.frames, args.fps, sink)
+    else:
+        pyglet.clock.schedule(tick)
+        pyglet.app.run()
@@ -0,0 +1,107 @@
+import ctypes
+import os
+import sys
+import time
+import pyglet
+from OpenGL.GL import *
+
+
+# Čitanje framebuffera preko dva PBO-a. glReadPixels u PBO je asinkron, pa se
+# u svakoj sličici pokreće kopiranje trenutne slike, a mapira se međuspremnik
+# prethodne sličice koji je do tada već gotov. Tako se cjevovod ne zaustavlja
+# čekajući GPU, a izlaz kasni točno jednu sličicu.
+class PixelReader:
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.size = width * height * 4
+        self.pbos = [int(b) for b in glGenBuffers(2)]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.index = 0
+        self.pending = False
+
+    # Pokreće čitanje trenutne slike i vraća prethodnu (None za prvu sličicu)
+    def read(self):
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[self.index])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        previous = self._map(self.pbos[1 - self.index]) if self.pending else None
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending = True
+        self.index = 1 - self.index
+        return previous
+
+    # Vraća posljednju pokrenutu sličicu na kraju snimanja
+    def flush(self):
+        if not self.pending:
+            return None
+        self.pending = False
+        data = self._map(self.pbos[1 - self.index])
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return data
+
+    def _map(self, pbo):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        ptr = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        data = ctypes.string_at(ptr, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        return data
+
+    def delete(self):
+        glDeleteBuffers(2, self.pbos)
+
+
+# Sprema sličice kao PNG niz frame_00000.png, frame_00001.png, ...
+class PngSink:
+    def __init__(self, directory):
+        self.directory = directory
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, data, width, height):
+        image = pyglet.image.ImageData(width, height, 'RGBA', data)
+        image.save(os.path.join(self.directory, "frame_%05d.png" % self.count))
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+# Sirovi RGBA tok (redovi odozdo prema gore), npr. za
+# ffmpeg -f rawvideo -pix_fmt rgba -s WxH -r FPS -i - -vf vflip out.mp4
+class RawSink:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data, width, height):
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.flush()
+
+
+# Deterministički prolaz kroz animaciju: svaka sličica pomiče animaciju za
+# točno 1/fps sekundi, iscrtava se u nevidljivi prozor i šalje u sink.
+# Vraća broj sličica u sekundi postignut pri renderiranju.
+def render_frames(window, step, draw, frames, fps, sink):
+    width, height = window.get_framebuffer_size()
+    reader = PixelReader(width, height)
+    start = time.perf_counter()
+    for _ in range(frames):
+        step(1.0 / fps)
+        draw()
+        data = reader.read()
+        if data is not None:
+            sink.write(data, width, height)
+    data = reader.flush()
+    if data is not None:
+        sink.write(data, width, height)
+    glFinish()
+    elapsed = time.perf_counter() - start
+    sink.close()
+    reader.delete()
+    throughput = frames / elapsed if elapsed > 0 else float('inf')
+    print("%d frames in %.2f s (%.1f fps)" % (frames, elapsed, throughput), file=sys.stderr)
+    return throughput
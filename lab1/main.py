@@ -1,39 +1,55 @@
+import argparse
+import os
+import sys
 import numpy as np
 import pyglet
+
+parser = argparse.ArgumentParser(description="Animacija objekta duž B-splajn krivulje")
+parser.add_argument("--model", default="assets/teddy.obj", help="model koji se kreće po krivulji")
+parser.add_argument("--headless", action="store_true", help="renderiranje bez prozora i zaslona (EGL)")
+parser.add_argument("--frames", type=int, default=300, help="broj sličica u headless načinu")
+parser.add_argument("--fps", type=float, default=60., help="korak animacije po sličici je 1/fps sekundi")
+parser.add_argument("--out", default="frames", help="direktorij za PNG sličice ili '-' za sirovi RGBA tok na stdout")
+args = parser.parse_args()
+
+# Headless način mora biti postavljen prije stvaranja prozora i učitavanja PyOpenGL-a
+if args.headless:
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    pyglet.options['headless'] = True
+
 from pyglet.gl import *
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 
+from obj_loader import load_obj
+from spline import B_SPLINE, ArcLengthTable, SplineTable, frenet_frame
+from renderer import SplineBuffers, mesh_buffer
+from headless import PngSink, RawSink, render_frames
 
-current_segment_t = 0 # Trenutni param korak na segmentu krivulje
-seg_id = 0 # Trenutni segment krivulje
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_profiler import create_profiler
+
+
+travelled = 0. # Put prijeđen po krivulji od početka animacije
+ANIMATION_SPEED = 0.5 # Brzina objekta u jedinicama duljine luka po sekundi
+use_dcm = False # Orijentacija objekta preko DCM matrice umjesto rotacije oko osi
+profiler = create_profiler() # Mjerenje trajanja sličica, uključuje se s FRAME_PROFILE=1
+hud_label = None
 
 
 SCREEN_W, SCREEN_H = 1500, 800
-cfg = pyglet.gl.Config(double_buffer=True, depth_size=24)
-app_window = pyglet.window.Window(SCREEN_W, SCREEN_H, config=cfg)
+# Traži se kompatibilni kontekst jer se koristi fiksni cjevovod (glMatrixMode, glVertexPointer)
+cfg = pyglet.gl.Config(double_buffer=True, depth_size=24, major_version=2, minor_version=1)
+app_window = pyglet.window.Window(SCREEN_W, SCREEN_H, config=cfg, visible=not args.headless)
 
 def import_spline(path, control_points, total_segments, ref_axis):
-    if not path.lower().endswith('.obj'):
-        raise ValueError("Only .obj is allowed.")
-    with open(path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line[0] in ['#', 'g']:
-                continue
-            parts = line.split()
-            if parts[0] == 'v':
-                x, y, z = map(float, parts[1:4])
-                if control_points is None:
-                    control_points = np.array([[x, y, z]]) # Ako je skup kontrolni točaka prazan, inicijaliziraj ga
-                else:
-                    control_points = np.vstack((control_points, [x, y, z])) # dodaj novi red u matricu
+    control_points, _ = load_obj(path)
 
     mx = np.max(control_points, axis=0)
     mn = np.min(control_points, axis=0)
     scale_val = np.max(mx - mn)
-    control_points /= scale_val # Kontrolne točke se skaliraju kako bi stale na ekran
+    control_points = control_points / scale_val # Kontrolne točke se skaliraju kako bi stale na ekran
     total_segments = len(control_points) - 3  # Svaki segment je definiran sa 4 kontrolne točke, a s n točaka određeno je n - 3 segmenata krivulje
     if total_segments > 0:
         v = control_points[1] / np.linalg.norm(control_points[1]) # Incijalni vektor orijentacije koji se normalizira da bi mu duljina bila 1
@@ -42,85 +58,37 @@ def import_spline(path, control_points, total_segments, ref_axis):
         
 # Učitava model iz .obj datoteke koji će se kretati po b-splajn krivulji
 def load_model(path, object_data):
-    if not path.lower().endswith('.obj'):
-        raise ValueError("Only .obj is allowed.")
-    with open(path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()
-            # Učitavanje vrhova
-            if parts[0] == 'v':
-                x, y, z = map(float, parts[1:4]) # Dobivanje koordinata vrha
-                if object_data["points"] is None:
-                    object_data["points"] = np.array([[x, y, z]]) # ako je object_data prazan, incijalziraj ga
-                else:
-                    object_data["points"] = np.vstack((object_data["points"], [x, y, z]))
-            # Učitavanje ploha
-            elif parts[0] == 'f':
-                i1, i2, i3 = map(int, parts[1:4])
-                if object_data["faces"] is None:
-                    object_data["faces"] = np.array([[i1, i2, i3]])
-                else:
-                    object_data["faces"] = np.vstack((object_data["faces"], [i1, i2, i3]))
+    # Vrhovi i plohe se čitaju u jednom prolazu (ili iz binarne predmemorije)
+    object_data["points"], object_data["faces"] = load_obj(path)
        
     # Normaliziraj veličinu modela
     max_val = np.max(object_data["points"], axis=0)
     min_val = np.min(object_data["points"], axis=0)
     scale_factor = np.max(max_val - min_val)
-    object_data["points"] /= scale_factor  # Scale model to fit within [-1,1] range
+    object_data["points"] = object_data["points"] / scale_factor  # Scale model to fit within [-1,1] range
 
     return object_data
 
-def tick_animation(*_):
-    global current_segment_t, seg_id
-    current_segment_t += 1
-    # Ako smo prošli sve korake na trenutnom segmentu, prelazimo na sljedeći segment seg_id
-    if current_segment_t >= len(param_range):
-        current_segment_t = 0
-        seg_id += 1
-        if seg_id >= total_segments:
-            seg_id = 0
-
-def calc_point(t_i, seg_control_points):
-    t_mat = np.array([[t_i**3, t_i**2, t_i, 1]])
-    return t_mat @ b_spline @ seg_control_points # Izlaz: koordinate točke p_i(t) na B-splajn krivulji
-
-def calc_tangent(t_i, seg_control_points):
-    t_mat = np.array([[3*t_i**2, 2*t_i, 1, 0]]) # Derivacija
-    return t_mat @ b_spline @ seg_control_points # Vektor tangente u točki na krivulji
-
-def calc_second_derivative(t_i, seg_control_points):
-    t_mat = np.array([[6*t_i, 2, 0, 0]])  # Druga derivacija
-    return t_mat @ b_spline @ seg_control_points
-
-# Izračun svih točaka na segmentu
-def segment_coords(seg_control_points):
-    segment = None
-    for t in param_range: # Prolazimo kroz sve vrijednosti t (0 do 1)
-        pt = calc_point(t, seg_control_points) # Računamo točku na krivulji
-        if segment is None:
-            segment = pt
-        else:
-            segment = np.vstack((segment, pt))
-    return segment # Lista točaka segmenta na krivulji
-
-# Izračunavanje svih tangenti na segmentu
-def segment_tangents(seg_control_points):
-    tangs = None
-    for t in param_range:
-        tg = calc_tangent(t, seg_control_points)
-        if tangs is None:
-            tangs = tg
-        else:
-            tangs = np.vstack((tangs, tg))
-    return tangs
+# Jedino mjesto gdje se mijenjaju kontrolne točke: tablice krivulje grade se ovdje,
+# a sličice ih samo čitaju, bez usporedbe kontrolnih točaka u svakoj sličici
+def set_control_points(points):
+    global control_points, spline_sample
+    control_points = points
+    curve.update(control_points)
+    arc_length.update(control_points)
+    spline_sample = arc_length.sample(travelled)
+
+# Pomak ovisi o proteklom vremenu, a ne o broju sličica, pa je brzina po krivulji stalna.
+# Točka, tangenta i druga derivacija čitaju se iz tablice duljine luka jednom po koraku.
+def tick_animation(dt):
+    global travelled, spline_sample
+    with profiler.scope("update"):
+        travelled += ANIMATION_SPEED * dt
+        spline_sample = arc_length.sample(travelled) # Tablica se gradi u set_control_points
 
 # Dohvaćanje trenutne pozicije objekta na putanji
 def get_spline_pos():
-    seg_ctrl = control_points[seg_id : seg_id + 4] # 4 kontrolne točke tren segmenta
-    return calc_point(param_range[current_segment_t], seg_ctrl)[0] # Računa se pozicija na krivulji
+    return spline_sample[0]
 
 # Računanje kuta između dva vektora (koliko se objekt treba rotirati od svog originalnog referentnog smjera)
 def vec_angle(s, e):
@@ -140,26 +108,18 @@ def setup_cam(cam_data):
     cam_data["center"] = center_vals.tolist()
     cam_data["up_dir"] = [0., 0., 1.] # Os "prema gore" postavljena na Z-os
 
-# Iscrtvanje krivulje i tangenti
+# Iscrtavanje kontrolnih točaka, krivulje i tangenti
 def draw_spline():
+    spline_buffers.sync(curve) # Šalje se na GPU samo ako se krivulja promijenila
     glPointSize(5)
     glColor3f(0.9, 0.2, 0.4) # Boja kontrolnih točaka
-    glBegin(GL_POINTS)
-    for x in control_points:
-        glVertex3f(x[0], x[1], x[2])
-    glEnd()
+    spline_buffers.points.draw()
     glLoadIdentity()
     glPointSize(1)
-    glColor3f(0.9, 0.9, 0.9) # Boja krivulje
-    glBegin(GL_LINE_STRIP)
-    for i in range(total_segments):
-        sub = control_points[i : i + 4] # Dohvati 4 kontrolne točke za trenutni segment
-        pts = segment_coords(sub) # Izračunaj sve točke na segmentu
-        tng = segment_tangents(sub) # Izračunaj tangente
-        for (p, t) in zip(pts, tng):
-            glVertex3f(p[0], p[1], p[2])
-            glVertex3f(p[0] + t[0], p[1] + t[1], p[2] + t[2])
-    glEnd()
+    glColor3f(0.9, 0.9, 0.9) # Boja tangenti
+    spline_buffers.tangents.draw()
+    glColor3f(1., 0.85, 0.3) # Krivulja prilagodljivo podijeljena prema zakrivljenosti
+    spline_buffers.polyline.draw()
 
 # Iscrtavanje objekta koji se kreće duž putanje
 def draw_entity(rot=None):
@@ -167,38 +127,59 @@ def draw_entity(rot=None):
     glColor3f(0.2, 0.8, 0.3)
     glScalef(0.2, 0.2, 0.2)
     #glScalef(0.01, 0.01, 0.01) # Skalira model
-    glBegin(GL_TRIANGLES)
-    for fc in object_data["faces"]: # Iterira kroz sve plohe modela
-        for idx in fc:
-            v = object_data["points"][idx - 1] # Dohvati koordinate vrha
-            if rot is not None:
-                v = np.dot(np.array([v]), rot)[0] # Primjeni rotaciju ako postoji
-            glVertex3f(v[0], v[1], v[2])
-    glEnd()
+    if rot is not None:
+        # Rotacija se primjenjuje kao matrica modela, pa se vrhovi ne transformiraju na CPU-u.
+        # Matrica se predaje redak po redak, što OpenGL čita kao transponiranu, tj. v @ rot.
+        model = np.identity(4, dtype=np.float32)
+        model[:3, :3] = rot
+        glMultMatrixf(model)
+    entity_mesh.draw() # Cijeli model jednim pozivom iz VBO-a
     
 def calculate_dcm():
-    current_params = param_range[current_segment_t], control_points[seg_id:seg_id + 4]
-    
-    w = calc_tangent(*current_params)  # Prva derivacija (tangenta)
-    #w /= np.linalg.norm(w)  # Normaliziraj
+    # Prva derivacija (tangenta) i druga derivacija
+    _, w, dt_dt = spline_sample
+    return frenet_frame(w, dt_dt) # Stupci su normirana tangenta, normala i binormala
 
-    dt_dt = calc_second_derivative(*current_params)  # Druga derivacija
-    u = np.cross(w, dt_dt)  # Izračunaj normalu
-    
-    #u /= np.linalg.norm(u)  # Normaliziraj normalu
-    v = np.cross(w, u)  # Izračunaj binormalu
-    #v /= np.linalg.norm(v)  # Normaliziraj binormalu
-
-    rotation_matrix = np.vstack((w, u, v)).T  
-    #print(w, u, v)
-
-    return rotation_matrix
 
+@app_window.event
+def on_key_press(symbol, modifiers):
+    global use_dcm
+    if symbol == pyglet.window.key.D: # Prebacivanje između DCM i rotacije oko osi
+        use_dcm = not use_dcm
+    elif symbol == pyglet.window.key.F3: # Prikaz mjerenja trajanja sličica
+        profiler.toggle_hud()
+
+# Ispis percentila trajanja sličice u gornjem lijevom kutu
+def draw_hud():
+    global hud_label
+    if not profiler.hud_visible:
+        return
+    if hud_label is None:
+        hud_label = pyglet.text.Label("", font_name="monospace", font_size=10, x=10, y=SCREEN_H - 10,
+                                      width=SCREEN_W, multiline=True, anchor_y="top")
+    glDisable(GL_DEPTH_TEST)
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    glOrtho(0, SCREEN_W, 0, SCREEN_H, -1, 1)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    hud_label.text = "\n".join(profiler.hud_lines())
+    hud_label.draw()
+    # pyglet 2 ostavlja svoj VAO vezan, a VBO-ovi modela bi inače promijenili njegov indeksni međuspremnik
+    if bool(glBindVertexArray):
+        glBindVertexArray(0)
 
 @app_window.event
 def on_draw():
     if not callable(glMatrixMode):
         return
+    with profiler.scope("render"):
+        draw_scene()
+    profiler.count("faces", len(object_data["faces"]))
+    draw_hud()
+    profiler.end_frame()
+
+def draw_scene():
     glEnable(GL_DEPTH_TEST)
     glClearColor(0., 0., 0.1, 1.)
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -213,23 +194,28 @@ def on_draw():
     draw_spline()
     pos = get_spline_pos() # Računa trenutnu poziciju na krivulji
     glTranslatef(pos[0], pos[1], pos[2]) # Pomiče objekt na tu poziciju
-    subset = control_points[seg_id : seg_id + 4]
-    
-    tg = calc_tangent(param_range[current_segment_t], subset) # Tangenta na trenutnoj poziciji
+
+    if use_dcm:
+        draw_entity(calculate_dcm())
+        return
+
+    tg = spline_sample[1] # Tangenta na trenutnoj poziciji
     tg = np.reshape(tg, (1, 3))
     rotation_axis = calc_rot_axis(tg) # Pronalazi os rotacije između trenutnog smjera i referentnog
     angle = vec_angle(ref_axis[0], tg[0]) # Kut rotacije
     glRotatef(angle, rotation_axis[0], rotation_axis[1], rotation_axis[2])
     
     draw_entity()
-    
-    #glScalef(20, 20,  20)
-    #dcm = calculate_dcm()
-    #draw_entity(dcm)
 
 def run():
     pyglet.clock.schedule(tick_animation)
     pyglet.app.run()
+    profiler.close()
+
+def run_headless():
+    sink = RawSink(sys.stdout.buffer) if args.out == "-" else PngSink(args.out)
+    render_frames(app_window, tick_animation, on_draw, args.frames, args.fps, sink)
+    profiler.close()
 
 if __name__ == "__main__":
     control_points = None # Skup kontrolnih točaka za krivulju
@@ -238,13 +224,8 @@ if __name__ == "__main__":
     total_segments = 0 # Ukupni broj segmenata
 
 
-    param_range = np.linspace(0, 1, 20)
-    b_spline = np.array([
-        [-1.,  3., -3.,  1.],
-        [ 3., -6.,  3.,  0.],
-        [-3.,  0.,  3.,  0.],
-        [ 1.,  4.,  1.,  0.]
-    ]) / 6.
+    param_range = np.linspace(0, 1, 20) # Uzorci po segmentu za prikaz tangenti
+    b_spline = B_SPLINE
 
     cam_data = {"pos": [0., 0., 0.],
                 "center": [0., 0., 0.],
@@ -252,6 +233,14 @@ if __name__ == "__main__":
     
     control_points, total_segments, ref_axis = import_spline("assets/path.obj", control_points, 
                                                              total_segments, ref_axis)
-    object_data = load_model("assets/teddy.obj", object_data)
+    object_data = load_model(args.model, object_data)
+    curve = SplineTable(b_spline, param_range) # Tablica uzoraka krivulje za tangente i poligon
+    arc_length = ArcLengthTable(b_spline) # Tablica duljine luka za jednoliko gibanje
+    set_control_points(control_points)
+    entity_mesh = mesh_buffer(object_data) # Model se šalje na grafičku karticu samo jednom
+    spline_buffers = SplineBuffers()
     setup_cam(cam_data)
-    run()
+    if args.headless:
+        run_headless()
+    else:
+        run()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import numpy as np
+
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache.npz"
+
+
+# Parsira .obj datoteku u jednom prolazu: koordinate i indeksi se skupljaju u
+# obične liste (amortizirano O(1) dodavanje), a u numpy polje se pretvaraju
+# samo jednom na kraju, pa je učitavanje linearno u veličini datoteke.
+def parse_obj(path):
+    if not path.lower().endswith('.obj'):
+        raise ValueError("Only .obj is allowed.")
+    coords = []
+    indices = []
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'v':
+                coords.extend(parts[1:4])
+            elif parts[0] == 'f':
+                # Podržani su i zapisi oblika "v/vt/vn", uzima se samo indeks vrha
+                indices.extend(p.split('/', 1)[0] for p in parts[1:4])
+
+    points = np.array(coords, dtype=np.float64).reshape(-1, 3)
+    faces = np.array(indices, dtype=np.int32).reshape(-1, 3)
+    return points, faces
+
+
+def cache_path(path):
+    return path + CACHE_SUFFIX
+
+
+# Ključ predmemorije: ako se datoteka promijeni, mijenja se vrijeme izmjene ili veličina
+def _cache_key(path):
+    st = os.stat(path)
+    return np.array([CACHE_VERSION, st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+
+def _read_cache(path, key):
+    try:
+        with np.load(cache_path(path)) as data:
+            if not np.array_equal(data["key"], key):
+                return None
+            return data["points"], data["faces"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# Piše se u privremenu datoteku jedinstvenog imena pored cilja, pa paralelna
+# pokretanja ne pišu u istu datoteku, a os.replace je atomaran
+def _write_cache(path, key, points, faces):
+    target = cache_path(path)
+    tmp = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(target) or ".", prefix=os.path.basename(target),
+                                         suffix=".tmp", delete=False) as f:
+            tmp = f.name
+            np.savez(f, key=key, points=points, faces=faces)
+        os.replace(tmp, target)
+    except OSError:
+        # Direktorij može biti samo za čitanje, tada se jednostavno radi bez predmemorije
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# Učitava vrhove i plohe, preko binarne predmemorije pored .obj datoteke ako je ona valjana
+def load_obj(path, use_cache=True):
+    if not use_cache:
+        return parse_obj(path)
+    key = _cache_key(path)
+    cached = _read_cache(path, key)
+    if cached is not None:
+        return cached
+    points, faces = parse_obj(path)
+    # Ključ se uzima nakon čitanja; ako se datoteka promijenila tijekom čitanja,
+    # pročitani podaci možda ne odgovaraju nijednoj verziji, pa se ne spremaju
+    read_key = _cache_key(path)
+    if np.array_equal(read_key, key):
+        _write_cache(path, read_key, points, faces)
+    return points, faces
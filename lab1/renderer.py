@@ -0,0 +1,167 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL.shaders import compileProgram, compileShader
+
+from tessellate import tessellate
+
+
+# Geometrija pohranjena na grafičkoj kartici (VBO + opcionalno IBO).
+# Podaci se šalju samo pri stvaranju ili eksplicitnom upload(), a draw() je jedan
+# poziv za cijeli objekt umjesto jednog glVertex3f po vrhu. Koristi se samo
+# funkcionalnost iz OpenGL 1.5, pa radi i na softverskom Mesa llvmpipe.
+class GeometryBuffer:
+    def __init__(self, mode, vertices=None, indices=None, usage=GL_STATIC_DRAW):
+        self.mode = mode
+        self.usage = usage
+        self.vbo = glGenBuffers(1)
+        self.ibo = None
+        self.count = 0
+        if vertices is not None:
+            self.upload(vertices, indices)
+
+    def upload(self, vertices, indices=None):
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, self.usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        if indices is None:
+            self.count = len(vertices)
+            return
+        indices = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+        if self.ibo is None:
+            self.ibo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, self.usage)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.count = len(indices)
+
+    def draw(self):
+        if self.count == 0:
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        if self.ibo is None:
+            glDrawArrays(self.mode, 0, self.count)
+        else:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+            glDrawElements(self.mode, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        glDeleteBuffers(1, [self.vbo])
+        if self.ibo is not None:
+            glDeleteBuffers(1, [self.ibo])
+        self.vbo = self.ibo = None
+        self.count = 0
+
+
+# Model iz .obj datoteke, plohe su indeksirane od 1 kao u object_data
+def mesh_buffer(object_data):
+    return GeometryBuffer(GL_TRIANGLES, object_data["points"], object_data["faces"] - 1)
+
+
+# Kontrolne točke, tangente u uzorcima tablice (parovi točka, točka + tangenta za
+# GL_LINES) i prilagodljivo podijeljena krivulja. Ponovno se šalju na grafičku
+# karticu samo kad se tablica krivulje promijeni.
+class SplineBuffers:
+    def __init__(self, tolerance=1e-3, tangent_scale=1.):
+        self.points = GeometryBuffer(GL_POINTS)
+        self.tangents = GeometryBuffer(GL_LINES)
+        self.polyline = GeometryBuffer(GL_LINE_STRIP)
+        self.tolerance = tolerance
+        self.tangent_scale = tangent_scale
+        self.version = None
+
+    def sync(self, table):
+        if table.version == self.version:
+            return
+        self.points.upload(table.control_points)
+        lines = np.stack((table.positions, table.positions + self.tangent_scale * table.tangents), axis=2)
+        self.tangents.upload(lines.reshape(-1, 3))
+        self.polyline.upload(tessellate(table.control_points, self.tolerance, table.basis))
+        self.version = table.version
+
+
+INSTANCE_VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute vec3 offset;
+attribute vec3 rot0;
+attribute vec3 rot1;
+attribute vec3 rot2;
+uniform float scale;
+void main() {
+    // Redak vrha puta matrica rotacije (v @ rot), kao u draw_entity
+    vec3 p = position * scale;
+    vec3 world = p.x * rot0 + p.y * rot1 + p.z * rot2 + offset;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(world, 1.0);
+    gl_FrontColor = gl_Color;
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 120
+void main() {
+    gl_FragColor = gl_Color;
+}
+"""
+
+INSTANCE_ATTRIBUTES = ("offset", "rot0", "rot1", "rot2")
+
+
+# Model koji se iscrtava u mnogo primjeraka jednim glDrawElementsInstanced pozivom.
+# Geometrija modela je statična, a po sličici se šalje samo jedan međuspremnik s
+# pomakom i matricom rotacije svake instance (12 float vrijednosti po instanci).
+# Potreban je OpenGL 3.3 (ili ARB_instanced_arrays), što podržava i Mesa llvmpipe.
+class InstancedMesh:
+    def __init__(self, object_data, scale=0.2):
+        self.scale = scale
+        self.mesh = mesh_buffer(object_data)
+        self.program = compileProgram(compileShader(INSTANCE_VERTEX_SHADER, GL_VERTEX_SHADER),
+                                      compileShader(INSTANCE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+                                      validate=False)
+        self.position_loc = glGetAttribLocation(self.program, "position")
+        self.instance_locs = [glGetAttribLocation(self.program, name) for name in INSTANCE_ATTRIBUTES]
+        self.scale_loc = glGetUniformLocation(self.program, "scale")
+        self.instance_vbo = glGenBuffers(1)
+        self.instances = 0
+
+    # Jedan glBufferData po sličici za sve instance (stari sadržaj se odbacuje)
+    def upload_instances(self, data):
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.instances = len(data)
+
+    def draw(self):
+        if self.instances == 0 or self.mesh.count == 0:
+            return
+        glUseProgram(self.program)
+        glUniform1f(self.scale_loc, self.scale)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.mesh.vbo)
+        glEnableVertexAttribArray(self.position_loc)
+        glVertexAttribPointer(self.position_loc, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        stride = 12 * 4
+        for i, loc in enumerate(self.instance_locs):
+            glEnableVertexAttribArray(loc)
+            glVertexAttribPointer(loc, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(i * 3 * 4))
+            glVertexAttribDivisor(loc, 1) # Vrijednost se mijenja po instanci, a ne po vrhu
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.mesh.ibo)
+        glDrawElementsInstanced(GL_TRIANGLES, self.mesh.count, GL_UNSIGNED_INT, ctypes.c_void_p(0), self.instances)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+        for loc in self.instance_locs:
+            glVertexAttribDivisor(loc, 0)
+            glDisableVertexAttribArray(loc)
+        glDisableVertexAttribArray(self.position_loc)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
@@ -0,0 +1,86 @@
+import numpy as np
+
+from spline import ArcLengthTable, basis_rows, frenet_frame
+
+
+# Scena s mnogo instanci koje se kreću po (različitim) B-splajn putanjama.
+# Stanje instanci je u poljima (struktura polja): indeks putanje, početni pomak
+# po krivulji i brzina. Sve putanje se spajaju u jednu zajedničku tablicu duljine
+# luka i koeficijenata, pa se položaji i orijentacije svih instanci računaju
+# jednim vektoriziranim prolazom po sličici, bez petlje po putanjama ili instancama.
+class Scene:
+    def __init__(self, basis, samples_per_segment=64):
+        self.basis = basis
+        self.samples_per_segment = samples_per_segment
+        self.paths = []
+        self.meshes = {} # ime -> {"path", "phase", "speed"}
+        self.positions = {}
+        self.orientations = {}
+        self._dirty = True
+
+    def add_path(self, control_points):
+        self.paths.append(ArcLengthTable(self.basis, self.samples_per_segment).update(control_points))
+        self._dirty = True
+        return len(self.paths) - 1
+
+    # Dodaje instance jednog modela; path, phase i speed mogu biti skalari ili polja
+    def add_instances(self, mesh, count, path=0, phase=0., speed=0.5):
+        new = {
+            "path": np.broadcast_to(np.asarray(path, dtype=np.intp), (count,)),
+            "phase": np.broadcast_to(np.asarray(phase, dtype=np.float64), (count,)),
+            "speed": np.broadcast_to(np.asarray(speed, dtype=np.float64), (count,)),
+        }
+        old = self.meshes.get(mesh)
+        if old is not None:
+            new = {k: np.concatenate((old[k], new[k])) for k in new}
+        self.meshes[mesh] = {k: np.ascontiguousarray(v) for k, v in new.items()}
+
+    def instance_count(self, mesh=None):
+        if mesh is not None:
+            return len(self.meshes[mesh]["path"])
+        return sum(len(m["path"]) for m in self.meshes.values())
+
+    # Spaja tablice svih putanja: intervali duljine luka i koeficijenti segmenata
+    # idu jedan iza drugog, a za svaku putanju pamti se gdje počinje
+    def _build(self):
+        intervals = self.samples_per_segment - 1
+        steps = [np.diff(p.cumulative) for p in self.paths]
+        self.cumulative = np.concatenate(([0.], np.cumsum(np.concatenate(steps))))
+        first = np.cumsum([0] + [len(s) for s in steps])
+        self.first_interval, self.last_interval = first[:-1], first[1:] - 1
+        self.offsets = self.cumulative[self.first_interval]
+        self.lengths = np.array([p.total_length for p in self.paths])
+        self.coefficients = np.concatenate([p.table.coefficients for p in self.paths])
+        self.params = self.paths[0].table.params
+        self.intervals = intervals
+        self._dirty = False
+
+    def _evaluate(self, path, distance):
+        d = np.mod(distance, self.lengths[path]) + self.offsets[path]
+        k = np.searchsorted(self.cumulative, d, side='right') - 1
+        k = np.clip(k, self.first_interval[path], self.last_interval[path])
+        span = self.cumulative[k + 1] - self.cumulative[k]
+        frac = np.where(span > 0, (d - self.cumulative[k]) / np.where(span > 0, span, 1.), 0.)
+        seg, j = np.divmod(k, self.intervals)
+        t = self.params[j] + frac * (self.params[j + 1] - self.params[j])
+
+        # Baza T, T', T'' za svaku instancu, pa T @ (B @ P) za pripadni segment
+        coeffs = self.coefficients[seg]
+        pos, first, second = (np.einsum('nk,nkd->nd', rows, coeffs) for rows in basis_rows(t))
+        return pos, frenet_frame(first, second)
+
+    # Računa položaj i DCM orijentaciju svih instanci u trenutku time (sekunde)
+    def update(self, time):
+        if self._dirty:
+            self._build()
+        for mesh, state in self.meshes.items():
+            distance = state["phase"] + state["speed"] * time
+            self.positions[mesh], self.orientations[mesh] = self._evaluate(state["path"], distance)
+
+    # Podaci po instanci za GPU: pomak (3) i retci matrice rotacije (9), float32
+    def instance_data(self, mesh):
+        count = self.instance_count(mesh)
+        data = np.empty((count, 12), dtype=np.float32)
+        data[:, :3] = self.positions[mesh]
+        data[:, 3:] = self.orientations[mesh].reshape(count, 9)
+        return data
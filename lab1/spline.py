@@ -0,0 +1,130 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Matrica uniformnog kubnog B-splajna
+B_SPLINE = np.array([
+    [-1.,  3., -3.,  1.],
+    [ 3., -6.,  3.,  0.],
+    [-3.,  0.,  3.,  0.],
+    [ 1.,  4.,  1.,  0.]
+]) / 6.
+
+
+# Kontrolne točke svih segmenata složene u polje oblika (segmenti, 4, 3)
+def segment_control_points(control_points):
+    return sliding_window_view(control_points, 4, axis=0).transpose(0, 2, 1)
+
+
+# Matrice T, T' i T'' za sve vrijednosti parametra odjednom, svaka oblika (n, 4)
+def basis_rows(params):
+    t = np.asarray(params, dtype=np.float64)
+    zeros, ones = np.zeros_like(t), np.ones_like(t)
+    pos = np.column_stack((t**3, t**2, t, ones))
+    first = np.column_stack((3*t**2, 2*t, ones, zeros))
+    second = np.column_stack((6*t, 2*ones, zeros, zeros))
+    return pos, first, second
+
+
+# Tablica točaka, tangenti i drugih derivacija za sve segmente krivulje.
+# Računa se jednom, jednom batch operacijom T @ B @ P, a iscrtavanje i animacija
+# samo indeksiraju tablicu [segment, uzorak].
+class SplineTable:
+    def __init__(self, basis, params):
+        self.basis = basis
+        self.params = np.asarray(params, dtype=np.float64)
+        self.control_points = None
+        self.positions = None # (segmenti, uzorci, 3)
+        self.tangents = None
+        self.second_derivatives = None
+        self.coefficients = None # B @ P za svaki segment, oblik (segmenti, 4, 3)
+        self.version = 0 # Povećava se pri svakoj izgradnji, kako bi korisnici tablice znali kad osvježiti podatke
+
+    # Ponovno računa tablice samo ako su se promijenile kontrolne točke ili uzorkovanje
+    def update(self, control_points, params=None):
+        if params is not None and not np.array_equal(params, self.params):
+            self.params = np.asarray(params, dtype=np.float64)
+            self.control_points = None
+        if self.control_points is not None and np.array_equal(control_points, self.control_points):
+            return self
+        self.control_points = np.array(control_points, dtype=np.float64)
+        self._build()
+        return self
+
+    def _build(self):
+        self.version += 1
+        if len(self.control_points) < 4:
+            empty = np.zeros((0, len(self.params), 3))
+            self.positions = self.tangents = self.second_derivatives = empty
+            self.coefficients = np.zeros((0, 4, 3))
+            return
+        # Koeficijenti polinoma za svaki segment: B @ P_i, oblik (segmenti, 4, 3)
+        coeffs = self.coefficients = self.basis @ segment_control_points(self.control_points)
+        pos, first, second = basis_rows(self.params)
+        self.positions = np.einsum('nk,skd->snd', pos, coeffs)
+        self.tangents = np.einsum('nk,skd->snd', first, coeffs)
+        self.second_derivatives = np.einsum('nk,skd->snd', second, coeffs)
+
+    @property
+    def total_segments(self):
+        return len(self.positions)
+
+
+# Tablica kumulativne duljine luka preko cijele krivulje. Gradi se jednom iz
+# gusto uzorkovane SplineTable, a prijeđeni put se binarnim pretraživanjem
+# pretvara u par susjednih uzoraka te tablice, iz kojih se linearno interpoliraju
+# točka, tangenta i druga derivacija. Cijena po sličici je O(log n) bez obzira na
+# duljinu putanje, bez ponovnog računanja baze krivulje.
+class ArcLengthTable:
+    def __init__(self, basis, samples_per_segment=64):
+        self.table = SplineTable(basis, np.linspace(0, 1, samples_per_segment))
+        self.cumulative = np.zeros(1)
+        self.version = None
+
+    def update(self, control_points):
+        self.table.update(control_points)
+        if self.table.version != self.version:
+            steps = np.linalg.norm(np.diff(self.table.positions, axis=1), axis=2) # (segmenti, uzorci - 1)
+            self.cumulative = np.concatenate(([0.], np.cumsum(steps)))
+            self.version = self.table.version
+        return self
+
+    @property
+    def total_length(self):
+        return self.cumulative[-1]
+
+    # Prijeđeni put (skalar ili polje) -> (točka, tangenta, druga derivacija) iz tablice
+    # uzoraka; put se ponavlja nakon kraja krivulje
+    def sample(self, distance):
+        intervals = len(self.table.params) - 1
+        if self.total_length <= 0:
+            k, frac = np.zeros(np.shape(distance), dtype=np.intp), np.zeros(np.shape(distance))
+        else:
+            d = np.mod(distance, self.total_length)
+            k = np.clip(np.searchsorted(self.cumulative, d, side='right') - 1, 0, len(self.cumulative) - 2)
+            span = self.cumulative[k + 1] - self.cumulative[k]
+            frac = np.where(span > 0, (d - self.cumulative[k]) / np.where(span > 0, span, 1.), 0.)
+        seg, j = np.divmod(k, intervals)
+        frac = np.asarray(frac)[..., None]
+        table = self.table
+        return tuple(values[seg, j] + frac * (values[seg, j + 1] - values[seg, j])
+                     for values in (table.positions, table.tangents, table.second_derivatives))
+
+
+def _normalize(vec, eps):
+    length = np.linalg.norm(vec, axis=-1, keepdims=True)
+    return vec / np.maximum(length, eps), length[..., 0]
+
+
+# DCM (w, u, v) iz tangente i druge derivacije, radi i nad poljima oblika (..., 3).
+# Kada je zakrivljenost nula (w i druga derivacija paralelni), normala se uzima
+# okomito na tangentu preko pomoćne osi, pa matrica ostaje ortonormirana.
+def frenet_frame(tangent, second_derivative, eps=1e-9):
+    w, _ = _normalize(np.asarray(tangent, dtype=np.float64), eps)
+    u, u_len = _normalize(np.cross(w, second_derivative), eps)
+    degenerate = u_len < eps
+    if np.any(degenerate):
+        helper = np.where(np.abs(w[..., 2:3]) < 0.9, [0., 0., 1.], [1., 0., 0.])
+        u = np.where(degenerate[..., None], _normalize(np.cross(w, helper), eps)[0], u)
+    v = np.cross(w, u)
+    return np.stack((w, u, v), axis=-1) # Stupci matrice su w, u, v
@@ -0,0 +1,119 @@
+import numpy as np
+
+from spline import B_SPLINE, SplineTable, basis_rows
+
+
+# Prilagodljiva podjela B-splajn krivulje na dužine.
+# Za kubni segment P(t) na intervalu [a, b] udaljenost krivulje od tetive je
+# najviše (b - a)^2 / 8 * max|P''(t)|, a P'' je linearan u t pa je maksimum na
+# rubovima intervala. Interval se dijeli dok ta granica ne padne ispod
+# tolerancije, tako da blagi segmenti dobiju malo vrhova, a oštri zavoji više.
+# Svi intervali iste razine obrađuju se zajedno, bez rekurzije po intervalu.
+def chord_error_bound(coefficients, seg, a, b):
+    _, _, second_a = basis_rows(a)
+    _, _, second_b = basis_rows(b)
+    coeffs = coefficients[seg]
+    acc_a = np.linalg.norm(np.einsum('nk,nkd->nd', second_a, coeffs), axis=1)
+    acc_b = np.linalg.norm(np.einsum('nk,nkd->nd', second_b, coeffs), axis=1)
+    return (b - a)**2 / 8. * np.maximum(acc_a, acc_b)
+
+
+# Vraća intervale (segment, a, b) koji zadovoljavaju toleranciju, poredane duž krivulje.
+# Raspolavljanje može segmentu dati više intervala nego jednolika podjela koja već
+# zadovoljava granicu cijelog segmenta (ceil(sqrt(granica / tolerancija)) dijelova),
+# pa se takvi segmenti zamjenjuju jednolikom podjelom i prilagodljiva podjela nikad
+# nema više vrhova od jednolike.
+def adaptive_intervals(coefficients, tolerance, max_depth=20):
+    segments = len(coefficients)
+    seg = np.arange(segments)
+    a, b = np.zeros(segments), np.ones(segments)
+    uniform = np.maximum(np.ceil(np.sqrt(chord_error_bound(coefficients, seg, a, b) / tolerance)), 1).astype(np.intp)
+    done_seg, done_a, done_b = [], [], []
+    for depth in range(max_depth + 1):
+        bound = chord_error_bound(coefficients, seg, a, b)
+        ok = bound <= tolerance
+        if depth == max_depth:
+            ok[:] = True
+        done_seg.append(seg[ok]), done_a.append(a[ok]), done_b.append(b[ok])
+        seg, a, b, bound = seg[~ok], a[~ok], b[~ok], bound[~ok]
+        if len(seg) == 0:
+            break
+        # Podjela na k jednakih dijelova smanjuje granicu barem k^2 puta. Blizu
+        # tolerancije odmah se dijeli na potreban broj dijelova, a daleko od nje
+        # se raspolavlja kako bi se gustoća vrhova prilagodila zakrivljenosti.
+        k = np.ceil(np.sqrt(bound / tolerance)).astype(np.intp)
+        k = np.where(k > 3, 2, np.maximum(k, 2))
+        first = np.repeat(np.cumsum(k) - k, k)
+        piece = np.arange(first.size) - first
+        width = np.repeat((b - a) / k, k)
+        seg, a = np.repeat(seg, k), np.repeat(a, k) + piece * width
+        b = a + width
+    seg, a, b = np.concatenate(done_seg), np.concatenate(done_a), np.concatenate(done_b)
+    over = np.bincount(seg, minlength=segments) > uniform
+    if np.any(over):
+        keep = ~over[seg]
+        k = uniform[over]
+        first = np.repeat(np.cumsum(k) - k, k)
+        piece = np.arange(first.size) - first
+        k = np.repeat(k, k)
+        seg = np.concatenate((seg[keep], np.repeat(np.flatnonzero(over), uniform[over])))
+        a = np.concatenate((a[keep], piece / k))
+        b = np.concatenate((b[keep], (piece + 1) / k))
+    order = np.lexsort((a, seg))
+    return seg[order], a[order], b[order]
+
+
+# Kompaktna float32 polilinija (n, 3) za iscrtavanje i upite o sudarima
+def tessellate(control_points, tolerance=1e-3, basis=B_SPLINE, max_depth=20):
+    table = SplineTable(basis, [0.]).update(control_points)
+    if table.total_segments == 0:
+        return np.zeros((0, 3), dtype=np.float32)
+    seg, a, b = adaptive_intervals(table.coefficients, tolerance, max_depth)
+    seg = np.append(seg, seg[-1])
+    t = np.append(a, b[-1]) # Početak svakog intervala i kraj posljednjeg
+    pos, _, _ = basis_rows(t)
+    return np.einsum('nk,nkd->nd', pos, table.coefficients[seg]).astype(np.float32)
+
+
+# Najveća stvarna udaljenost krivulje od polilinije, uz gusto uzorkovanje svakog intervala
+def measured_error(control_points, tolerance, basis=B_SPLINE, samples=32):
+    table = SplineTable(basis, [0.]).update(control_points)
+    seg, a, b = adaptive_intervals(table.coefficients, tolerance)
+    u = np.linspace(0., 1., samples)
+    t = a[:, None] + (b - a)[:, None] * u # (intervali, uzorci)
+    pos, _, _ = basis_rows(t.ravel())
+    pts = np.einsum('nk,nkd->nd', pos, table.coefficients[np.repeat(seg, samples)]).reshape(len(seg), samples, 3)
+    start, end = pts[:, :1], pts[:, -1:]
+    chord = end - start
+    length = np.maximum(np.linalg.norm(chord, axis=2, keepdims=True), 1e-12)
+    rel = pts - start
+    # Udaljenost od dužine: projekcija na tetivu ograničena na [0, 1]
+    s = np.clip(np.sum(rel * chord, axis=2, keepdims=True) / length**2, 0., 1.)
+    return np.max(np.linalg.norm(rel - s * chord, axis=2))
+
+
+if __name__ == "__main__":
+    from obj_loader import load_obj
+    rng = np.random.default_rng(0)
+    path, _ = load_obj("assets/path.obj")
+    path = path / np.max(np.max(path, axis=0) - np.min(path, axis=0))
+    # Duga putanja: slučajna šetnja s mnogo dugih blagih dijelova i pokojim oštrim zavojem
+    steps = rng.normal(size=(2000, 3)) * np.where(rng.random((2000, 1)) < 0.05, 1., 0.05)
+    long_path = np.cumsum(steps + [0.3, 0., 0.], axis=0)
+    failures = 0
+    for name, cps in (("path.obj", path), ("random walk", long_path)):
+        for tol in (1e-2, 1e-3, 1e-4):
+            adaptive = tessellate(cps, tol)
+            error = measured_error(cps, tol)
+            # Jednoliko uzorkovanje (isti broj uzoraka u svakom segmentu, kao param_range) uz istu granicu
+            table = SplineTable(B_SPLINE, [0.]).update(cps)
+            worst = chord_error_bound(table.coefficients, np.arange(table.total_segments),
+                                      np.zeros(table.total_segments), np.ones(table.total_segments)).max()
+            uniform = table.total_segments * int(np.ceil(np.sqrt(worst / tol))) + 1
+            # Greška mora biti unutar tolerancije, a vrhova ne smije biti više nego jednoliko
+            ok = error <= tol and len(adaptive) <= uniform
+            failures += not ok
+            print("%-12s tol=%-7g adaptive=%7d uniform=%8d max error=%.3g %s"
+                  % (name, tol, len(adaptive), uniform, error, "ok" if ok else "FAILED"))
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,54 @@
+import os
+import time
+
+from parallel import ParallelParticles
+from particles import ParticleSystem
+from snow_cover import SnowCover
+from wind_field import WindField
+
+
+WIDTH, HEIGHT = 1300, 700
+STEPS = 60
+PARTICLES = 200000
+DT = 1 / 60.
+
+
+# Trajanje jednog koraka (nove pahulje, mreža vjetra, snijeg i sve čestice) za
+# sustav u glavnoj niti (workers=0) ili podijeljen na radnike. Mjeri se vrijeme do
+# kraja zadnjeg koraka, pa se računa i ono što radnici rade u pozadini.
+def bench(workers, mode="thread"):
+    if workers:
+        system = ParallelParticles(WIDTH, HEIGHT, capacity=PARTICLES, workers=workers, mode=mode, seed=0)
+    else:
+        system = ParticleSystem(WIDTH, HEIGHT, capacity=PARTICLES, seed=0)
+    field = WindField(WIDTH, HEIGHT, turbulence=200., seed=0)
+    cover = SnowCover(WIDTH, flake_volume=0.5, melt=20.)
+    system.spawn(PARTICLES, HEIGHT / 2)
+    start = None
+    for step in range(STEPS + 10):
+        if step == 10: # Zagrijavanje: pokretanje radnika i prvo punjenje bazena
+            if workers:
+                system.wait()
+            start = time.perf_counter()
+        system.save_state()
+        system.spawn(PARTICLES // 100, HEIGHT + 30)
+        field.step(DT)
+        system.update(DT, field=field, ground=cover)
+        cover.step(DT)
+    if workers:
+        system.wait()
+    elapsed = (time.perf_counter() - start) / STEPS
+    if workers:
+        system.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    print("%d čestica, %d jezgri procesora" % (PARTICLES, os.cpu_count()))
+    single = bench(0)
+    print("%-10s %8s %12s %10s" % ("način", "radnika", "korak [ms]", "ubrzanje"))
+    print("%-10s %8s %12.2f %10s" % ("glavna nit", "-", single * 1000, "1.00"))
+    for mode in ("thread", "process"):
+        for workers in (1, 2, 4, 8):
+            elapsed = bench(workers, mode)
+            print("%-10s %8d %12.2f %10.2f" % (mode, workers, elapsed * 1000, single / elapsed))
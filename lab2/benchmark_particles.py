@@ -0,0 +1,254 @@
+import gc
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from particles import ParticleSystem
+from wind_field import WindField
+from snow_cover import SnowCover
+from emitters import EmitterSystem
+from recording import STREAMS, Recorder, Recording
+
+
+WIDTH, HEIGHT = 1300, 700
+STEPS = 120
+LEGACY_MAX_PARTICLES = 20000 # Stara petlja je prespora za veće brojeve
+DT = 1 / 60.
+WIND_STEPS = 20
+
+
+# Prijašnja petlja po objektima (bez spriteova), zadržana samo radi usporedbe
+class LegacyFlake:
+    def __init__(self, x, y):
+        self.depth_factor = random.uniform(0.01, 1.0)
+        self.rotation_speed = random.choice([-30, 30])
+        self.x, self.y, self.rotation = x, y, 0.
+        self.vx = self.vy = 0.
+
+
+def legacy_step(flakes, dt, wind):
+    to_remove = []
+    for flake in flakes:
+        flake.vy += -80 * dt * (flake.depth_factor * 1.2)
+        flake.vx += random.uniform(-4, 4) * (flake.depth_factor * 1.2)
+        if wind is not None:
+            dx, dy = flake.x - wind[0], flake.y - wind[1]
+            dist = math.sqrt(dx*dx + dy*dy)
+            if 0 < dist < 50:
+                flake.vx += dx / dist * 3000 * dt * (flake.depth_factor * 1.2)
+                flake.vy += dy / dist * 3000 * dt * (flake.depth_factor * 1.2)
+        flake.x += flake.vx * dt
+        flake.y += flake.vy * dt
+        flake.rotation += flake.rotation_speed * dt
+        if flake.y < -50 or flake.x < -50 or flake.x > WIDTH + 50:
+            to_remove.append(flake)
+    for flake in to_remove:
+        flakes.remove(flake)
+
+
+# Pahulje raspoređene po cijelom ekranu, uz stalno dopunjavanje do n kao u igri;
+# s ground=True pahulje slijeću na snježni pokrivač koji se svaki korak izravnava
+def bench_engine(n, ground=False):
+    cover = SnowCover(WIDTH, flake_volume=0.5, melt=20.) if ground else None # Nizak pokrivač, kao u igri
+    system = ParticleSystem(WIDTH, HEIGHT, capacity=n, seed=0)
+    system.spawn(n, 0.)
+    system.position[:n, 1] = system.rng.uniform(0, HEIGHT, n)
+    start = time.perf_counter()
+    for step in range(STEPS):
+        system.spawn(n - system.count, HEIGHT + 30)
+        system.update(DT, wind=[(WIDTH / 2, HEIGHT / 2)] if step % 2 else (), ground=cover)
+        if cover is not None:
+            cover.step(DT)
+    return (time.perf_counter() - start) / STEPS
+
+
+def bench_legacy(n):
+    flakes = [LegacyFlake(random.uniform(0, WIDTH), random.uniform(0, HEIGHT)) for _ in range(n)]
+    start = time.perf_counter()
+    for step in range(STEPS):
+        flakes.extend(LegacyFlake(random.uniform(0, WIDTH), HEIGHT + 30) for _ in range(n - len(flakes)))
+        legacy_step(flakes, DT, (WIDTH / 2, HEIGHT / 2) if step % 2 else None)
+    return (time.perf_counter() - start) / STEPS
+
+
+# Vjetar kao prije prostorne mreže: svaki izvor računa udaljenost do svih čestica
+def brute_wind(system, wind, k, dt):
+    n = system.count
+    pos, vel = system.position[:n], system.velocity[:n]
+    for wx, wy in wind:
+        d = pos - np.array((wx, wy), dtype=np.float32)
+        dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+        near = (dist < system.wind_radius) & (dist > 0.)
+        force = np.zeros(n, dtype=np.float32)
+        np.divide(k, dist, out=force, where=near)
+        force *= system.wind_strength * dt
+        vel += d * force[:, None]
+
+
+# Trajanje samo vjetra za sources izvora raspoređenih po ekranu: svi-sa-svima
+# naspram mreže (uključena izgradnja mreže); vraća i najveću razliku brzina
+def bench_wind(n, sources):
+    rng = np.random.default_rng(sources)
+    wind = list(zip(rng.uniform(0, WIDTH, sources), rng.uniform(0, HEIGHT, sources)))
+    system = ParticleSystem(WIDTH, HEIGHT, capacity=n, seed=0)
+    system.spawn(n, 0.)
+    system.position[:n, 1] = system.rng.uniform(0, HEIGHT, n)
+    k = system.depth_factor * 1.2
+    times = []
+    for apply in (brute_wind, system.apply_wind):
+        system.velocity[:] = 0.
+        start = time.perf_counter()
+        for _ in range(WIND_STEPS):
+            apply(system, wind, k, DT) if apply is brute_wind else apply(wind, k, DT)
+        times.append((time.perf_counter() - start) / WIND_STEPS)
+        times.append(system.velocity.copy())
+    return times[0], times[2], float(np.abs(times[1] - times[3]).max())
+
+
+# Mreža vjetra s vrtložnim šumom i dva izvora: korak mreže (ovisi samo o veličini
+# ćelije) i korak čestica koje iz nje uzimaju brzinu
+def bench_field(n, cell_size):
+    field = WindField(WIDTH, HEIGHT, cell_size=cell_size, turbulence=200., seed=0)
+    system = ParticleSystem(WIDTH, HEIGHT, capacity=n, seed=0)
+    system.spawn(n, 0.)
+    system.position[:n, 1] = system.rng.uniform(0, HEIGHT, n)
+    field_time = particle_time = 0.
+    for _ in range(STEPS):
+        start = time.perf_counter()
+        field.add_radial(WIDTH / 2, HEIGHT / 2, 50, 3000, DT)
+        field.add_directional(WIDTH / 4, HEIGHT / 2, 80, 3000, 0., DT)
+        field.step(DT)
+        middle = time.perf_counter()
+        system.spawn(n - system.count, HEIGHT + 30)
+        system.update(DT, field=field)
+        field_time, particle_time = field_time + middle - start, particle_time + time.perf_counter() - middle
+    return field_time / STEPS, particle_time / STEPS
+
+
+# Emiteri dima s ukupno oko n živih čestica raspoređenih na zadani broj emitera:
+# trajanje koraka ovisi o broju čestica, a ne o broju emitera
+def bench_emitters(n, emitters):
+    lifetime = 4.
+    config = [{"texture": "smoke", "shape": {"type": "circle", "x": WIDTH * (i + 0.5) / emitters, "y": 100,
+                                             "radius": 10},
+               "rate": n / lifetime / emitters, "lifetime": lifetime, "velocity": {"x": [-10, 10], "y": [20, 40]},
+               "buoyancy": 10, "drag": 0.2, "size": [[0, 0.5], [1, 2]], "opacity": [[0, 1], [1, 0]]}
+              for i in range(emitters)]
+    system = EmitterSystem(config, {"smoke": ((0, 0, 1, 1), (50, 50))}, WIDTH, HEIGHT, capacity=2 * n, seed=0)
+    for _ in range(int(lifetime / DT)): # Do ustaljenog broja čestica
+        system.update(DT)
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        system.update(DT)
+    return (time.perf_counter() - start) / STEPS, system.count
+
+
+# Snimanje n pahulja kroz STEPS koraka: trajanje upisa sličice, veličina sličice,
+# otvaranje snimke i dohvat nasumičnih sličica (s čitanjem položaja iz datoteke)
+def bench_recording(n):
+    system = ParticleSystem(WIDTH, HEIGHT, capacity=n, seed=0)
+    cover = SnowCover(WIDTH)
+    system.spawn(n, HEIGHT / 2)
+    path = os.path.join(tempfile.mkdtemp(), "bench.rec")
+    recorder = Recorder(path, streams={name: STREAMS[name] for name in ("snow", "cover")})
+    elapsed = 0.
+    for step in range(STEPS):
+        system.update(DT)
+        start = time.perf_counter()
+        recorder.write(step * DT, snow=system, cover=cover)
+        elapsed += time.perf_counter() - start
+    recorder.close()
+    size = os.path.getsize(path) / STEPS
+
+    start = time.perf_counter()
+    recording = Recording(path)
+    opened = time.perf_counter() - start
+    order = np.random.default_rng(0).permutation(len(recording))
+    start = time.perf_counter()
+    for index in order:
+        float(recording.frame(index)["snow"].position[:, 1].sum())
+    frame = (time.perf_counter() - start) / len(order)
+    recording.close()
+    os.remove(path)
+    return elapsed / STEPS, size, opened, frame
+
+
+# Memorija i skupljanje smeća tijekom STEPS koraka nakon zagrijavanja: neto porast
+# zauzete memorije, najveće privremeno zauzeće i broj pokretanja gc-a
+def allocations(step, state):
+    for _ in range(STEPS):
+        step(state)
+    collections = sum(s["collections"] for s in gc.get_stats())
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(STEPS):
+        step(state)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current - base, peak - base, sum(s["collections"] for s in gc.get_stats()) - collections
+
+
+def engine_step(system):
+    system.spawn(system.capacity - system.count, HEIGHT + 30)
+    system.update(DT, wind=[(WIDTH / 2, HEIGHT / 2)])
+
+
+def field_step(state):
+    system, field = state
+    field.step(DT)
+    system.spawn(system.capacity - system.count, HEIGHT + 30)
+    system.update(DT, field=field)
+
+
+def legacy_churn(flakes, n=2000):
+    flakes.extend(LegacyFlake(random.uniform(0, WIDTH), HEIGHT + 30) for _ in range(n - len(flakes)))
+    legacy_step(flakes, DT, (WIDTH / 2, HEIGHT / 2))
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    print("%10s %14s %14s %14s" % ("čestica", "numpy [ms]", "s tlom [ms]", "petlja [ms]"))
+    for n in (2000, 10000, 100000, 200000, 500000):
+        engine, ground = bench_engine(n) * 1000, bench_engine(n, ground=True) * 1000
+        legacy = "%14.2f" % (bench_legacy(n) * 1000) if n <= LEGACY_MAX_PARTICLES else "%14s" % "-"
+        print("%10d %14.2f %14.2f %s" % (n, engine, ground, legacy))
+
+    print()
+    print("%10s %8s %14s %14s %12s" % ("čestica", "izvora", "svi [ms]", "mreža [ms]", "razlika"))
+    for n in (100000, 200000):
+        for sources in (1, 4, 16):
+            brute, grid, diff = bench_wind(n, sources)
+            print("%10d %8d %14.2f %14.2f %12.2e" % (n, sources, brute * 1000, grid * 1000, diff))
+
+    print()
+    print("%10s %8s %14s %14s" % ("čestica", "ćelija", "mreža [ms]", "čestice [ms]"))
+    for n in (10000, 100000):
+        for cell_size in (10, 20, 40):
+            print("%10d %8d %14.2f %14.2f" % ((n, cell_size) + tuple(t * 1000 for t in bench_field(n, cell_size))))
+
+    print()
+    print("%10s %8s %14s" % ("čestica", "emitera", "emiteri [ms]"))
+    for n in (10000, 100000):
+        for emitters in (1, 10, 100):
+            elapsed, count = bench_emitters(n, emitters)
+            print("%10d %8d %14.2f" % (count, emitters, elapsed * 1000))
+
+    print()
+    print("%10s %12s %14s %14s %14s" % ("čestica", "upis [ms]", "sličica [kB]", "otvaranje [ms]", "dohvat [ms]"))
+    for n in (10000, 100000):
+        written, size, opened, frame = bench_recording(n)
+        print("%10d %12.2f %14.1f %14.2f %14.2f" % (n, written * 1000, size / 1024, opened * 1000, frame * 1000))
+
+    print()
+    print("%-22s %12s %14s %6s" % ("%d koraka" % STEPS, "neto [B]", "privremeno [B]", "gc"))
+    system = ParticleSystem(WIDTH, HEIGHT, capacity=100000, seed=0)
+    print("%-22s %12d %14d %6d" % (("bazen, 100000 čestica",) + allocations(engine_step, system)))
+    field = WindField(WIDTH, HEIGHT, turbulence=200., seed=0)
+    system = ParticleSystem(WIDTH, HEIGHT, capacity=100000, seed=0)
+    print("%-22s %12d %14d %6d" % (("mreža vjetra, 100000",) + allocations(field_step, (system, field))))
+    flakes = [LegacyFlake(random.uniform(0, WIDTH), random.uniform(0, HEIGHT)) for _ in range(2000)]
+    print("%-22s %12d %14d %6d" % (("petlja, 2000 objekata",) + allocations(legacy_churn, flakes)))
@@ -0,0 +1,47 @@
+import argparse
+import sys
+import numpy as np
+
+from recording import Recording
+
+parser = argparse.ArgumentParser(description="Usporedba dviju snimki simulacije sličicu po sličicu")
+parser.add_argument("first")
+parser.add_argument("second")
+parser.add_argument("--tolerance", type=float, default=0., help="najveća dopuštena razlika vrijednosti polja")
+args = parser.parse_args()
+
+first, second = Recording(args.first), Recording(args.second)
+frames = min(len(first), len(second))
+print("%d / %d sličica, uspoređuje se %d" % (len(first), len(second), frames))
+if len(first) != len(second):
+    print("snimke nemaju jednak broj sličica")
+
+# Za svaku sličicu broj čestica po toku i najveća razlika svakog polja; kad se broj
+# čestica razlikuje, polja se ne uspoređuju jer čestice više nisu u paru
+streams = [name for name in first.streams if name in second.streams]
+worst = {}
+diverged = None
+for index in range(frames):
+    a, b = first.frame(index), second.frame(index)
+    for name in streams:
+        if a[name].count != b[name].count:
+            diverged = diverged or (index, name, a[name].count, b[name].count)
+            continue
+        for field, _, _ in first.streams[name]:
+            difference = np.abs(getattr(a[name], field).astype(np.float64) - getattr(b[name], field)).max(initial=0.)
+            key = name + "." + field
+            if difference > worst.get(key, (-1., 0))[0]:
+                worst[key] = (difference, index)
+
+print("%-24s %14s %10s" % ("polje", "najveća razl.", "sličica"))
+for key, (difference, index) in sorted(worst.items()):
+    mark = "" if difference <= args.tolerance else "  <-"
+    print("%-24s %14.6g %10d%s" % (key, difference, index, mark))
+if diverged is not None:
+    print("broj čestica se prvi put razlikuje u sličici %d (%s: %d / %d)" % diverged)
+
+# Izlazni status 1 kad se snimke razlikuju, da se usporedba može koristiti kao provjera
+# ponovljivosti u skriptama
+if len(first) != len(second) or diverged is not None or \
+        any(difference > args.tolerance for difference, _ in worst.values()):
+    sys.exit(1)
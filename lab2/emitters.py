@@ -0,0 +1,275 @@
+import json
+import numpy as np
+
+
+SHAPES = {"point": 0, "line": 1, "rect": 2, "circle": 3}
+CURVE_SAMPLES = 64 # Broj uzoraka krivulje po životu čestice
+
+
+def load_config(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Krivulja [[t, vrijednost], ...] (t od 0 do 1, vrijednost broj ili lista) uzorkovana
+# u CURVE_SAMPLES točaka linearnom interpolacijom
+def sample_curve(keys, default):
+    if not keys:
+        keys = [[0., default]]
+    t = np.array([key[0] for key in keys], dtype=np.float32)
+    values = np.array([key[1] for key in keys], dtype=np.float32).reshape(len(keys), -1)
+    samples = np.linspace(0., 1., CURVE_SAMPLES, dtype=np.float32)
+    return np.stack([np.interp(samples, t, values[:, i]) for i in range(values.shape[1])], axis=1)
+
+
+def _range(value, default):
+    value = default if value is None else value
+    return value if isinstance(value, (list, tuple)) else (value, value)
+
+
+# Sustav čestica za sve emitere iz JSON opisa (dim, baloni, ...), u obliku strukture
+# polja kao ParticleSystem. Čestica pamti samo indeks svog emitera, a svojstva
+# emitera (oblik, brzine, uzgon, otpor, slika u atlasu, krivulje veličine,
+# prozirnosti i boje kroz život) su mala polja po emiteru iz kojih se za sve
+# čestice odjednom uzima s np.take. Zato cijena koraka ovisi o broju živih
+# čestica, a ne o broju emitera; i nove čestice svih emitera nastaju jednim
+# vektoriziranim prolazom.
+#
+# sprites preslikava ime teksture u (uv_rect, (širina, visina)) slike u atlasu.
+class EmitterSystem:
+    def __init__(self, emitters, sprites, width, height, capacity=5000, margin=200., seed=None):
+        self.width, self.height, self.margin = width, height, margin
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.names = [emitter.get("name", emitter["texture"]) for emitter in emitters]
+        e = len(emitters)
+
+        def column(key, default):
+            return np.array([emitter.get(key, default) for emitter in emitters], dtype=np.float32)
+
+        self.rate = column("rate", 10.)
+        self.buoyancy = column("buoyancy", 0.)
+        self.drag = column("drag", 0.)
+        self.wind = column("wind", 0.)
+        self._accumulator = np.zeros(e, dtype=np.float32)
+        self._credit = np.zeros(e) # Neiskorišteni udjeli mjesta kad je bazen pun
+        # Rasponi (min, max) iz kojih se nasumično biraju svojstva nove čestice
+        self.lifetime = np.array([_range(em.get("lifetime"), 1.) for em in emitters], dtype=np.float32).reshape(e, 2)
+        self.velocity_x = np.array([_range(em.get("velocity", {}).get("x"), 0.) for em in emitters],
+                                   dtype=np.float32).reshape(e, 2)
+        self.velocity_y = np.array([_range(em.get("velocity", {}).get("y"), 0.) for em in emitters],
+                                   dtype=np.float32).reshape(e, 2)
+        self.spin = np.array([_range(em.get("rotation_speed"), 0.) for em in emitters], dtype=np.float32).reshape(e, 2)
+
+        # Oblik izvora: vrsta i parametri (x, y, širina, visina, radijus)
+        self.shape = np.array([SHAPES[em["shape"]["type"]] for em in emitters], dtype=np.int8)
+        self.shape_params = np.array([[em["shape"].get(key, 0.) for key in ("x", "y", "width", "height", "radius")]
+                                      for em in emitters], dtype=np.float32).reshape(e, 5)
+
+        self.uv_rect = np.array([sprites[em["texture"]][0] for em in emitters], dtype=np.float32).reshape(e, 4)
+        self.image_size = np.array([sprites[em["texture"]][1] for em in emitters], dtype=np.float32).reshape(e, 2)
+
+        # Krivulje kroz život, spljoštene: uzorak i emitera e je na e * CURVE_SAMPLES + i.
+        # Veličina je već pomnožena veličinom slike, a prozirnost je četvrti kanal boje,
+        # pa svaku od njih popunjava jedan np.take u susjedne retke polja.
+        self.size_curve = np.concatenate([sample_curve(em.get("size"), 1.) * self.image_size[i]
+                                          for i, em in enumerate(emitters)])
+        self.color_curve = np.concatenate([np.hstack((sample_curve(em.get("color"), [1., 1., 1.]),
+                                                      sample_curve(em.get("opacity"), 1.)))
+                                           for em in emitters])
+
+        # Palete boja (npr. različiti baloni), spojene; emiter bira iz svog odsječka
+        palettes = [em.get("palette") or [[1., 1., 1.]] for em in emitters]
+        self.palette = np.array([list(color) + [1.] for palette in palettes for color in palette], dtype=np.float32)
+        self.palette_start = np.cumsum([0] + [len(p) for p in palettes[:-1]]).astype(np.intp)
+        self.palette_size = np.array([len(p) for p in palettes], dtype=np.float32)
+
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.rotation = np.zeros(capacity, dtype=np.float32)
+        self.rotation_speed = np.zeros(capacity, dtype=np.float32)
+        self.age = np.zeros(capacity, dtype=np.float32)
+        self.lifespan = np.ones(capacity, dtype=np.float32)
+        self.emitter = np.zeros(capacity, dtype=np.intp)
+        self.tint = np.ones((capacity, 4), dtype=np.float32) # Boja iz palete; alfa je uvijek 1
+        self.uv = np.zeros((capacity, 4), dtype=np.float32) # Izrezak atlasa, ne mijenja se
+        self.arrays = (self.position, self.velocity, self.rotation, self.rotation_speed, self.age,
+                       self.lifespan, self.emitter, self.tint, self.uv)
+
+        # Svojstva za iscrtavanje, računaju se na kraju update()
+        self.size = np.zeros((capacity, 2), dtype=np.float32)
+        self.color = np.zeros((capacity, 4), dtype=np.float32)
+
+        self._tmp = np.empty(capacity, dtype=np.float32)
+        self._tmp2 = np.empty(capacity, dtype=np.float32)
+        self._tmp3 = np.empty(capacity, dtype=np.float32)
+        self._params = np.empty((capacity, 5), dtype=np.float32)
+        self._shape = np.empty(capacity, dtype=np.int8)
+        self._sample = np.empty(capacity, dtype=np.intp)
+        self._offset = np.empty(capacity, dtype=np.intp)
+        self._mask = np.empty(capacity, dtype=bool)
+        self._mask2 = np.empty(capacity, dtype=bool)
+        self._index = np.arange(capacity, dtype=np.intp)
+        self._holes = np.empty(capacity, dtype=np.intp)
+        self._movers = np.empty(capacity, dtype=np.intp)
+        self._moved = tuple(np.empty_like(arr) for arr in self.arrays)
+
+    # Vrijednost iz raspona (min, max) po emiteru za svaku novu česticu, upisana u out
+    def _uniform(self, ranges, ids, out):
+        n = len(ids)
+        value = self.rng.random(n, dtype=np.float32, out=self._tmp[:n])
+        low = np.take(ranges[:, 0], ids, out=self._tmp2[:n])
+        high = np.take(ranges[:, 1], ids, out=self._tmp3[:n])
+        high -= low
+        value *= high
+        value += low
+        out[:] = value
+
+    # Broj novih čestica po emiteru. Kad sve ne stanu u bazen, preostalo mjesto dijeli
+    # se razmjerno traženom broju (dakle brzini emitera). Razlomljeni dijelovi udjela
+    # skupljaju se po emiteru, a ostatak mjesta dobivaju emiteri s najviše skupljenog,
+    # pa i spori emiteri kroz više koraka dobiju svoj dio, a ne samo prvi po redu.
+    def _spawn_counts(self, dt):
+        self._accumulator += self.rate * dt
+        counts = self._accumulator.astype(np.intp)
+        self._accumulator -= counts
+        requested, room = int(counts.sum()), self.capacity - self.count
+        if requested <= room:
+            return counts, requested
+        if room <= 0:
+            return counts, 0
+        exact = counts * (room / requested)
+        share = exact.astype(np.intp)
+        self._credit += exact - share
+        leftover = room - int(share.sum())
+        if leftover:
+            chosen = np.argsort(np.where(counts > share, -self._credit, np.inf), kind="stable")[:leftover]
+            share[chosen] += 1
+            self._credit[chosen] -= 1.
+        return share, room
+
+    def _spawn(self, dt):
+        counts, total = self._spawn_counts(dt)
+        if total <= 0:
+            return
+        start, end = self.count, self.count + total
+        # Indeksi emitera redom po broju čestica, bez privremenog polja: jedinica na
+        # početku odsječka svakog sljedećeg emitera pa kumulativni zbroj
+        ids = self.emitter[start:end]
+        ids[:] = 0
+        bounds = np.cumsum(counts[:-1])
+        np.add.at(ids, bounds[bounds < total], 1)
+        np.cumsum(ids, out=ids)
+        self.age[start:end] = 0.
+        self.rotation[start:end] = 0.
+        self._uniform(self.lifetime, ids, self.lifespan[start:end])
+        self._uniform(self.velocity_x, ids, self.velocity[start:end, 0])
+        self._uniform(self.velocity_y, ids, self.velocity[start:end, 1])
+        self._uniform(self.spin, ids, self.rotation_speed[start:end])
+
+        # Položaj unutar oblika izvora; svi oblici računaju se zajedno, pa se bira po vrsti
+        x, y, w, h, r = np.take(self.shape_params, ids, axis=0, out=self._params[:total]).T
+        shape = np.take(self.shape, ids, out=self._shape[:total])
+        u = self.rng.random(total, dtype=np.float32, out=self._tmp[:total])
+        v = self.rng.random(total, dtype=np.float32, out=self._tmp2[:total])
+        px, py, tmp = self.position[start:end, 0], self.position[start:end, 1], self._tmp3[:total]
+        rect, along = np.equal(shape, SHAPES["rect"], out=self._mask[:total]), self._mask2[:total]
+        np.equal(shape, SHAPES["line"], out=along)
+        along |= rect # Crta i pravokutnik šire se po x
+        np.multiply(u, w, out=px)
+        px *= along
+        px += x
+        np.multiply(v, h, out=py)
+        py *= rect
+        py += y
+        circle = np.equal(shape, SHAPES["circle"], out=self._mask[:total])
+        np.sqrt(v, out=v)
+        v *= r # Udaljenost od središta kruga
+        u *= 2 * np.pi # Kut
+        for coords, center, trig in ((px, x, np.cos), (py, y, np.sin)):
+            trig(u, out=tmp)
+            tmp *= v
+            tmp += center
+            np.copyto(coords, tmp, where=circle)
+
+        value = self.rng.random(total, dtype=np.float32, out=self._tmp[:total])
+        value *= np.take(self.palette_size, ids, out=self._tmp2[:total])
+        choice = self._sample[:total]
+        choice[:] = value
+        choice += np.take(self.palette_start, ids, out=self._offset[:total])
+        np.take(self.palette, choice, axis=0, out=self.tint[start:end])
+        np.take(self.uv_rect, ids, axis=0, out=self.uv[start:end])
+        self.count = end
+
+    # Jedan korak: nove čestice, uzgon, otpor, vjetar iz mreže (field) i starenje
+    def update(self, dt, field=None):
+        self._spawn(dt)
+        n = self.count
+        if n == 0:
+            return
+        emitter, vel, tmp = self.emitter[:n], self.velocity[:n], self._tmp[:n]
+        np.take(self.buoyancy, emitter, out=tmp)
+        tmp *= dt
+        vel[:, 1] += tmp
+        np.take(self.drag, emitter, out=tmp)
+        np.multiply(tmp, -dt, out=tmp)
+        tmp += 1.
+        np.maximum(tmp, 0., out=tmp)
+        vel[:, 0] *= tmp
+        vel[:, 1] *= tmp
+        if field is not None:
+            coupling = np.take(self.wind, emitter, out=self._tmp3[:n])
+            coupling *= dt
+            air_u, air_v = field.sample(self.position[:n], (tmp, self._tmp2[:n]))
+            air_u *= coupling
+            air_v *= coupling
+            vel[:, 0] += air_u
+            vel[:, 1] += air_v
+        for column in (0, 1):
+            np.multiply(vel[:, column], dt, out=tmp)
+            self.position[:n, column] += tmp
+        np.multiply(self.rotation_speed[:n], dt, out=tmp)
+        self.rotation[:n] += tmp
+        self.age[:n] += dt
+        self.cull()
+        self._prepare_render()
+
+    # Uklanja istrošene čestice i one daleko izvan ekrana. Kao u ParticleSystem, žive
+    # čestice s kraja bazena premještaju se u rupe, pa se miče samo onoliko čestica
+    # koliko ih je nestalo, a ne cijeli bazen.
+    def cull(self):
+        n, m = self.count, self.margin
+        dead, other = self._mask[:n], self._mask2[:n]
+        np.greater_equal(self.age[:n], self.lifespan[:n], out=dead)
+        x, y = self.position[:n, 0], self.position[:n, 1]
+        for coords, low, high in ((x, -m, self.width + m), (y, -m, self.height + m)):
+            np.less_equal(coords, low, out=other)
+            dead |= other
+            np.greater_equal(coords, high, out=other)
+            dead |= other
+        dead_count = int(np.count_nonzero(dead))
+        if dead_count == 0:
+            return
+        alive_count = n - dead_count
+        front = dead[:alive_count]
+        moves = int(np.count_nonzero(front))
+        holes = np.compress(front, self._index[:alive_count], out=self._holes[:moves])
+        tail_alive = np.logical_not(dead[alive_count:], out=other[alive_count:])
+        movers = np.compress(tail_alive, self._index[alive_count:n], out=self._movers[:moves])
+        for arr, scratch in zip(self.arrays, self._moved):
+            arr[holes] = np.take(arr, movers, axis=0, out=scratch[:moves])
+        self.count = alive_count
+
+    # Veličina, izrezak atlasa i boja svake čestice iz krivulja njenog emitera
+    def _prepare_render(self):
+        n = self.count
+        emitter, sample, t = self.emitter[:n], self._sample[:n], self._tmp[:n]
+        np.divide(self.age[:n], self.lifespan[:n], out=t)
+        np.clip(t, 0., 1., out=t)
+        t *= CURVE_SAMPLES - 1
+        sample[:] = t
+        sample += np.multiply(emitter, CURVE_SAMPLES, out=self._offset[:n])
+        np.take(self.size_curve, sample, axis=0, out=self.size[:n])
+        np.take(self.color_curve, sample, axis=0, out=self.color[:n])
+        self.color[:n] *= self.tint[:n]
@@ -1,108 +1,177 @@
+import argparse
 import pyglet
-import random
-import math
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_profiler import NullProfiler, create_profiler
+from particles import ParticleSystem
+from parallel import ParallelParticles
+from recording import Recorder, Recording, ReplayPlayer
+from emitters import EmitterSystem, load_config
+from renderer import EmitterRenderer, ParticleRenderer, SnowCoverRenderer, build_atlas
+from snow_cover import SnowCover
+from timestep import FixedTimestep
+from wind_field import WindField
+
+parser = argparse.ArgumentParser(description="Simulacija snijega")
+parser.add_argument("--config", default="emitters.json", help="JSON opis tekstura, snijega i emitera (dim, baloni)")
+parser.add_argument("--flakes-per-frame", type=int, default=2, help="broj novih pahulja po koraku simulacije")
+parser.add_argument("--max-flakes", type=int, default=2000, help="najveći broj pahulja (npr. 100000)")
+parser.add_argument("--gusts", type=int, default=0, help="broj skriptiranih naleta vjetra koji prelaze ekran")
+parser.add_argument("--wind", choices=("field", "points"), default="field",
+                    help="vjetar kroz mrežu brzine zraka ili izravno iz točaka vjetra")
+parser.add_argument("--turbulence", type=float, default=0., help="jačina vrtložnog šuma u mreži vjetra (npr. 200)")
+parser.add_argument("--obstacle", type=float, nargs=3, action="append", default=[], metavar=("X", "Y", "R"),
+                    help="kružna prepreka u kojoj zrak miruje i na koju pada snijeg (može se ponoviti)")
+parser.add_argument("--snow-melt", type=float, default=0.5, help="topljenje nakupljenog snijega u pikselima po sekundi")
+parser.add_argument("--sim-rate", type=float, default=60., help="broj koraka simulacije u sekundi, neovisno o prikazu")
+parser.add_argument("--substeps", type=int, default=1, help="broj podkoraka u svakom koraku simulacije")
+parser.add_argument("--max-steps", type=int, default=5, help="najviše koraka simulacije po sličici kad simulacija kasni")
+parser.add_argument("--seed", type=int, default=None, help="sjeme slučajnih brojeva, za ponovljive izvedbe")
+parser.add_argument("--workers", type=int, default=0,
+                    help="broj radnika za simulaciju čestica (0 = sve u glavnoj niti)")
+parser.add_argument("--worker-mode", choices=("thread", "process"), default="thread",
+                    help="radnici kao niti ili procesi (procesi samo na POSIX sustavima)")
+parser.add_argument("--record", default=None, help="snima stanje čestica nakon svakog koraka simulacije u datoteku")
+parser.add_argument("--replay", default=None,
+                    help="reproducira snimku umjesto simulacije (razmaknica zaustavlja, strelice pomiču za "
+                         "jednu sličicu, povlačenje mišem klizi kroz snimku)")
+args = parser.parse_args()
 
 WINDOW_WIDTH = 1300
 WINDOW_HEIGHT = 700
 window = pyglet.window.Window(WINDOW_WIDTH, WINDOW_HEIGHT, 'Simulacija Snijega')
 
-# Parametri simulacije
-NEW_FLAKES_PER_FRAME = 2
-WIND_STRENGTH = 3000   
-GRAVITY = -80    
-WIND_RADIUS = 50
-ROTATION_SPEED = 30
-MAX_SNOWFLAKES = 2000
-
-# Učitavanje slike pahulje
-snowflake_img = pyglet.image.load('snow.bmp')
-snowflake_img.anchor_x = snowflake_img.width // 2
-snowflake_img.anchor_y = snowflake_img.height // 2
+# Reprodukcija ne simulira nego crta sličice iz snimke, s opisom iz same snimke
+recording = player = None
+if args.replay:
+    try:
+        recording = Recording(args.replay)
+        player = ReplayPlayer(recording)
+    except ValueError as error:
+        parser.error("%s: %s" % (args.replay, error))
+    config = recording.meta["config"]
+else:
+    config = load_config(args.config)
+
+# Parametri simulacije; snijeg i emiteri opisani su u JSON datoteci
+SNOW = config["snow"]
+NEW_FLAKES_PER_FRAME = args.flakes_per_frame
+WIND_STRENGTH = SNOW["wind_strength"]
+GRAVITY = SNOW["gravity"]
+WIND_RADIUS = SNOW["wind_radius"]
+ROTATION_SPEED = SNOW["rotation_speed"]
+MAX_SNOWFLAKES = args.max_flakes
+GUSTS = args.gusts
+GUST_SPEED = 200 # Brzina naleta u pikselima po sekundi
+GUST_RADIUS = 80
+WIND_CELL_SIZE = 20
+
+# Sve slike (pahulja, dim, balon) u jednom atlasu, pa i snijeg i emiteri koriste istu teksturu
+atlas_texture, sprites, atlas_regions = build_atlas(config["textures"])
 
 #batch = pyglet.graphics.Batch()
 
-far_batch = pyglet.graphics.Batch()
-middle_batch = pyglet.graphics.Batch()
-close_batch = pyglet.graphics.Batch()
-
-class Snowflake:
-
-    def __init__(self, x, y):
-        self.depth_factor = random.uniform(0.01, 1.0)
-        if self.depth_factor < 0.4:
-            self.sprite = pyglet.sprite.Sprite(snowflake_img, x=x, y=y, batch=far_batch)
-            self.rotation_speed = random.choice([-(ROTATION_SPEED - 10), ROTATION_SPEED - 10])
-        elif self.depth_factor < 0.7:
-            self.sprite = pyglet.sprite.Sprite(snowflake_img, x=x, y=y, batch=middle_batch)
-            self.rotation_speed = random.choice([-(ROTATION_SPEED - 5), ROTATION_SPEED - 5])
-        else:
-            self.sprite = pyglet.sprite.Sprite(snowflake_img, x=x, y=y, batch=close_batch)
-            self.rotation_speed = random.choice([-(ROTATION_SPEED), ROTATION_SPEED])    
-        self.vx = 0
-
-        self.vy = 0
-        self.sprite.scale = 0.05 + 0.1 * self.depth_factor
-        self.sprite.opacity = int(255 * self.depth_factor)
-
-snowflakes = []
+profiler = create_profiler() # Mjerenje trajanja sličica, uključuje se s FRAME_PROFILE=1
+hud_label = None # Natpis s mjerenjima postoji samo kad je profiler uključen
+if not isinstance(profiler, NullProfiler):
+    hud_label = pyglet.text.Label("", font_name="monospace", font_size=10, x=10, y=WINDOW_HEIGHT - 10,
+                                  width=WINDOW_WIDTH, multiline=True, anchor_y="top")
+
+particle_options = dict(gravity=GRAVITY, wind_strength=WIND_STRENGTH, wind_radius=WIND_RADIUS,
+                        rotation_speed=ROTATION_SPEED, seed=args.seed)
+if args.workers:
+    # Radnici računaju korak dok glavna nit crta zadnji dovršeni korak
+    particles = ParallelParticles(WINDOW_WIDTH, WINDOW_HEIGHT, capacity=MAX_SNOWFLAKES + NEW_FLAKES_PER_FRAME,
+                                  workers=args.workers, mode=args.worker_mode, **particle_options)
+else:
+    particles = ParticleSystem(WINDOW_WIDTH, WINDOW_HEIGHT, capacity=MAX_SNOWFLAKES + NEW_FLAKES_PER_FRAME,
+                               **particle_options)
+
+# Snijeg se nakuplja na tlu i preprekama umjesto da pahulje nestanu ispod ekrana
+snow_cover = SnowCover(WINDOW_WIDTH, column_width=recording.meta["column_width"] if recording else 4.,
+                       melt=args.snow_melt)
+for x, y, r in args.obstacle:
+    snow_cover.add_obstacle(x, y, r)
+
+# Mreža brzine zraka u koju pišu miš, naleti i prepreke (samo za --wind field)
+wind_field = None
+if args.wind == "field":
+    wind_field = WindField(WINDOW_WIDTH, WINDOW_HEIGHT, cell_size=WIND_CELL_SIZE, turbulence=args.turbulence,
+                           seed=args.seed)
+    for x, y, r in args.obstacle:
+        wind_field.add_obstacle(x, y, r)
+
+# Svi slojevi dubine iscrtavaju se iz polja sustava čestica, bez Sprite objekata
+snow_renderer = ParticleRenderer(atlas_regions[SNOW["texture"]])
+
+# Svi emiteri iz opisa dijele jedan sustav čestica i crtaju se jednim pozivom
+emitters = EmitterSystem(config["emitters"], sprites, WINDOW_WIDTH, WINDOW_HEIGHT,
+                         capacity=config.get("max_particles", 5000), seed=args.seed)
+emitter_renderer = EmitterRenderer(atlas_texture)
+cover_renderer = SnowCoverRenderer(snow_cover)
+
+# Simulacija ide fiksnim korakom, a prikaz interpolira između zadnja dva stanja
+timestep = FixedTimestep(args.sim_rate, substeps=args.substeps, max_steps=args.max_steps)
+
+recorder = None
+if args.record:
+    recorder = Recorder(args.record, config=config, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, dt=timestep.dt,
+                        column_width=snow_cover.column_width)
 
 mouse_pressed = False
 mouse_x = 0
 mouse_y = 0
+sim_time = 0.
 
-def create_snowflakes():
-    for _ in range(NEW_FLAKES_PER_FRAME):
-        x = random.uniform(0, WINDOW_WIDTH)
-        y = WINDOW_HEIGHT + 30  # malo iznad vrha ekrana
-        snowflakes.append(Snowflake(x, y))
-    #print(len(snowflakes))
+# Položaji naleta: jednoliko raspoređeni po visini, putuju slijeva nadesno
+def gust_positions():
+    return [((sim_time * GUST_SPEED + i * WINDOW_WIDTH / GUSTS) % WINDOW_WIDTH, WINDOW_HEIGHT * (i + 1) / (GUSTS + 1))
+            for i in range(GUSTS)]
 
+# Početak koraka simulacije: pamti stanje za interpolaciju i dodaje nove pahulje
+def begin_step(dt):
+    particles.save_state()
+    # Dodajemo nove pahulje malo iznad vrha ekrana
+    if particles.count <= MAX_SNOWFLAKES:
+        particles.spawn(NEW_FLAKES_PER_FRAME, WINDOW_HEIGHT + 30)
+
+# Jedan podkorak simulacije fiksne duljine dt
 def update_snowflakes(dt):
-    # Dodajemo nove pahulje
-    if len(snowflakes) <= MAX_SNOWFLAKES:
-        create_snowflakes()
-    
-    to_remove = []
-    for flake in snowflakes:
-        # Primijeni gravitaciju
-        flake.vy += GRAVITY * dt * (flake.depth_factor * 1.2)
-        flake.vx += random.uniform(-4, 4) * (flake.depth_factor * 1.2)
-        
-        if mouse_pressed:
-            # Izračunaj vektor od točke miša do pahulje
-            dx = flake.sprite.x - mouse_x
-            dy = flake.sprite.y - mouse_y
-            dist = math.sqrt(dx*dx + dy*dy)
-            
-            # Što je pahulja bliže točki, to je jača sila
-            if dist < WIND_RADIUS:  # radijus djelovanja vjetra
-
-                if dist > 0:
-                    ndx = dx / dist
-                    ndy = dy / dist
-                else:
-                    ndx = 0
-                    ndy = 0
-                flake.vx += ndx * WIND_STRENGTH * dt * (flake.depth_factor * 1.2)
-                flake.vy += ndy * WIND_STRENGTH * dt * (flake.depth_factor * 1.2)
-                #print('depth factor: {}, vx: {}, vy: {}'.format(flake.depth_factor, flake.vx, flake.vy))
-
-        # Ažuriraj poziciju pahulje
-        flake.sprite.x += flake.vx * dt
-        flake.sprite.y += flake.vy * dt
-        flake.sprite.rotation += flake.rotation_speed * dt
-
-        # Uklanjanje pahulja
-        if flake.sprite.y < -50 or flake.sprite.x < -50 or flake.sprite.x > WINDOW_WIDTH + 50:
-            to_remove.append(flake)
-
-    for flake in to_remove:
-        snowflakes.remove(flake)
-        
+    global sim_time
+    sim_time += dt
+    if wind_field is None:
+        # Miš i naleti guraju pahulje izravno, svaki iz svoje točke
+        particles.update(dt, wind=([(mouse_x, mouse_y)] if mouse_pressed else []) + gust_positions(), ground=snow_cover)
+    else:
+        with profiler.scope("wind_field"):
+            if mouse_pressed:
+                wind_field.add_radial(mouse_x, mouse_y, WIND_RADIUS, WIND_STRENGTH, dt)
+            for x, y in gust_positions():
+                wind_field.add_directional(x, y, GUST_RADIUS, WIND_STRENGTH, 0., dt)
+            wind_field.step(dt)
+        particles.update(dt, field=wind_field, ground=snow_cover)
+    with profiler.scope("emitters"):
+        emitters.update(dt, field=wind_field)
+    with profiler.scope("snow_cover"):
+        snow_cover.step(dt)
+
+# Kraj koraka simulacije: snima stanje. S radnicima (--workers) render_state() je
+# zadnji dovršeni korak, pa snimka kasni jedan korak za simulacijom.
+def end_step():
+    recorder.write(sim_time, snow=particles.render_state(), emitters=emitters, cover=snow_cover)
+
+# U reprodukciji položaj miša po x bira sličicu snimke
+def scrub(x):
+    player.seek(round(x / WINDOW_WIDTH * (len(recording) - 1)))
+
 @window.event
 def on_mouse_press(x, y, button, modifiers):
     global mouse_pressed, mouse_x, mouse_y
-    if button == pyglet.window.mouse.LEFT:
+    if player is not None:
+        scrub(x)
+    elif button == pyglet.window.mouse.LEFT:
         mouse_pressed = True
         mouse_x = x
         mouse_y = y
@@ -116,21 +185,65 @@ def on_mouse_release(x, y, button, modifiers):
 @window.event
 def on_mouse_drag(x, y, dx, dy, buttons, modifiers):
     global mouse_x, mouse_y
+    if player is not None:
+        scrub(x)
     # Ako se drži lijevi klik i mičemo miš, ažuriraj poziciju
-    if buttons & pyglet.window.mouse.LEFT:
+    elif buttons & pyglet.window.mouse.LEFT:
         mouse_x = x
         mouse_y = y
 
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol == pyglet.window.key.F3: # Prikaz mjerenja trajanja sličica
+        profiler.toggle_hud()
+    elif player is not None:
+        if symbol == pyglet.window.key.SPACE:
+            player.paused = not player.paused
+        elif symbol in (pyglet.window.key.LEFT, pyglet.window.key.RIGHT):
+            player.step(1 if symbol == pyglet.window.key.RIGHT else -1)
+
 @window.event
 def on_draw():
-    window.clear()
-    far_batch.draw()
-    middle_batch.draw()
-    close_batch.draw()
+    with profiler.scope("render"):
+        if player is None:
+            snow, emitter_particles, alpha = particles.render_state(), emitters, timestep.alpha
+        else:
+            frame = player.frame()
+            snow, emitter_particles, alpha = frame["snow"], frame["emitters"], 1.
+            snow_cover.surface[:] = frame["cover"].surface
+        snow_renderer.upload(snow, alpha)
+        window.clear()
+        snow_renderer.draw()
+        emitter_renderer.upload(emitter_particles)
+        emitter_renderer.draw()
+        cover_renderer.upload()
+        cover_renderer.draw()
+    profiler.count("particles", snow.count)
+    profiler.count("emitter_particles", emitter_particles.count)
+    if hud_label is not None and profiler.hud_visible:
+        hud_label.text = "\n".join(profiler.hud_lines())
+        hud_label.draw()
+    profiler.end_frame()
 
 def update(dt):
-    update_snowflakes(dt)
+    if player is not None:
+        player.advance(dt)
+        profiler.count("replay_frame", player.index)
+        return
+    recycled, landed = particles.stats["recycled"], particles.stats["landed"]
+    with profiler.scope("simulation"):
+        steps = timestep.advance(dt, begin_step, update_snowflakes, end_step if recorder else None)
+    profiler.count("sim_steps", steps)
+    # Stanje bazena: ponovno iskorištena mjesta u ovom koraku i slobodna mjesta
+    profiler.count("recycled", particles.stats["recycled"] - recycled)
+    profiler.count("pool_free", particles.capacity - particles.count)
+    profiler.count("landed", particles.stats["landed"] - landed)
 
 if __name__ == '__main__':
-    pyglet.clock.schedule_interval(update, 1/60.0)
+    pyglet.clock.schedule(update) # Svaka sličica; broj koraka simulacije određuje FixedTimestep
     pyglet.app.run()
+    if args.workers:
+        particles.close()
+    if recorder is not None:
+        recorder.close()
+    profiler.close()
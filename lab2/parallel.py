@@ -0,0 +1,254 @@
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+
+from particles import ParticleSystem, lerp
+from snow_cover import SnowCover
+from wind_field import WindField
+
+
+# Polja stanja za iscrtavanje, redom kojim leže u jednom bloku dijeljene memorije
+RENDER_FIELDS = (("position", np.float32, 2), ("previous_position", np.float32, 2),
+                 ("rotation", np.float32, 1), ("previous_rotation", np.float32, 1),
+                 ("depth_factor", np.float32, 1), ("layer", np.int8, 1))
+
+
+# Jedan međuspremnik stanja za iscrtavanje u bloku multiprocessing.shared_memory,
+# kojeg vide i glavna nit i radnici (niti ili procesi). Svaki radnik piše žive
+# čestice na početak svog raspona mjesta, a glavna nit ih nakon koraka spaja u
+# jedan odsječak [0, count), pa iscrtavač i snimanje obrađuju samo žive čestice.
+# Sučelje (count, capacity, layers, depth_factor, interpolate) isto je kao kod
+# ParticleSystem, pa ga ParticleRenderer crta bez izmjena.
+class RenderState:
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        self.count = 0
+        size = sum(np.dtype(dtype).itemsize * width * capacity for _, dtype, width in RENDER_FIELDS)
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        offset = 0
+        for field, dtype, width in RENDER_FIELDS:
+            shape = (capacity, width) if width > 1 else (capacity,)
+            setattr(self, field, np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset))
+            offset += np.dtype(dtype).itemsize * width * capacity
+        self._render_position = self._render_rotation = None
+
+    def layers(self):
+        return self.layer[:self.count]
+
+    def interpolate(self, alpha):
+        n = self.count
+        if alpha >= 1.:
+            return self.position[:n], self.rotation[:n]
+        if self._render_position is None:
+            self._render_position, self._render_rotation = np.empty_like(self.position), np.empty_like(self.rotation)
+        return (lerp(self.previous_position[:n], self.position[:n], alpha, self._render_position[:n]),
+                lerp(self.previous_rotation[:n], self.rotation[:n], alpha, self._render_rotation[:n]))
+
+    # Upisuje žive čestice sustava na početak raspona koji počinje na start
+    def publish(self, system, start):
+        n = system.count
+        for field, _, _ in RENDER_FIELDS:
+            getattr(self, field)[start:start + n] = getattr(system, field)[:n]
+
+    # Spaja žive čestice radnika (counts[i] čestica od starts[i]) u odsječak [0, count).
+    # Prvi radnik je već na mjestu, a ostali se pomiču samo za rupu ispred sebe.
+    def compact(self, starts, counts):
+        end = 0
+        for start, n in zip(starts, counts):
+            if start != end and n:
+                for field, _, _ in RENDER_FIELDS:
+                    array = getattr(self, field)
+                    array[end:end + n] = array[start:start + n]
+            end += n
+        self.count = end
+
+    def close(self, unlink=False):
+        for field, _, _ in RENDER_FIELDS:
+            setattr(self, field, None) # Pogledi moraju nestati prije zatvaranja bloka
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+# Konačno polje mreže vjetra (flow_u, flow_v) u bloku dijeljene memorije. Glavna
+# nit ga prepisuje jednim kopiranjem prije svakog koraka, dok radnici miruju, a
+# radnici iz njega izravno uzorkuju, pa se mreža ne šalje kroz cijevi.
+class SharedFlow:
+    def __init__(self, shape, name=None):
+        self.shape = tuple(shape)
+        size = 2 * int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.flow = np.ndarray((2,) + self.shape, dtype=np.float32, buffer=self.memory.buf)
+
+    def close(self, unlink=False):
+        self.flow = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+# Petlja radnika: vlastiti ParticleSystem za raspon [start, end) ukupnog bazena.
+# Za svaki korak prima naredbu s novim pahuljama, vjetrom, imenom bloka s mrežom
+# vjetra i površinom snijega, izvodi korak, upisuje rezultat u zadani međuspremnik
+# i vraća broj čestica, statistiku i snijeg koji je u tom koraku pao. Tlo mijenja
+# samo glavna nit, pa radnici u zajedničku memoriju pišu samo svoj raspon.
+def _worker_loop(connection, start, end, capacity, buffer_names, width, height, options, seed):
+    system = ParticleSystem(width, height, capacity=end - start, seed=seed, **options)
+    buffers = [RenderState(capacity, name) for name in buffer_names]
+    field = flow = ground = None
+    while True:
+        command = connection.recv()
+        if command is None:
+            break
+        save, spawns, dt, wind, field_state, ground_state, target = command
+        if save:
+            system.save_state()
+        for n, y in spawns:
+            system.spawn(n, y)
+        if field_state is not None:
+            name, cell_size, coupling = field_state
+            if field is None or field.cell_size != cell_size or flow.memory.name != name:
+                field = WindField(width, height, cell_size=cell_size)
+                if flow is not None:
+                    flow.close()
+                flow = SharedFlow(field.flow_u.shape, name)
+                field.flow_u, field.flow_v = flow.flow # Uzorkovanje čita izravno iz bloka
+            field.coupling = coupling
+        if ground_state is not None:
+            column_width, flake_volume, surface = ground_state
+            if ground is None or ground.column_width != column_width:
+                ground = SnowCover(width, column_width=column_width)
+            ground.flake_volume = flake_volume
+            ground.surface[:] = surface
+            ground.snow[:] = 0.
+            ground.deposited = 0
+        if dt:
+            system.update(dt, wind, field if field_state is not None else None,
+                          ground if ground_state is not None else None)
+        buffers[target].publish(system, start)
+        connection.send((system.count, dict(system.stats),
+                         (ground.snow.copy(), ground.deposited) if ground_state is not None else None))
+    field = None
+    if flow is not None:
+        flow.close()
+    for buffer in buffers:
+        buffer.close()
+    connection.close()
+
+
+# Sustav čestica podijeljen na workers radnika (niti ili procese), svaki sa svojim
+# rasponom bazena. NumPy tijekom rada na poljima otpušta GIL, pa se i niti izvode
+# istovremeno. Sučelje je isto kao kod ParticleSystem: spawn() i save_state() samo
+# se pamte i šalju uz sljedeći update(), a update() čeka da radnici dovrše
+# prethodni korak, zamijeni međuspremnike i pokrene novi korak bez čekanja.
+# Dok radnici računaju, glavna nit crta render_state(), tj. zadnji dovršeni korak.
+#
+# Procesi se pokreću s fork (samo POSIX): način spawn bi ponovno izvršio lab2.py
+# i otvorio novi prozor u svakom radniku.
+class ParallelParticles:
+    def __init__(self, width, height, capacity=100000, workers=2, mode="thread", seed=None, **options):
+        self.capacity = capacity
+        self.workers = workers
+        self.buffers = [RenderState(capacity), RenderState(capacity)]
+        self.front = 0 # Međuspremnik koji se crta; radnici pišu u drugi
+        self.count = 0
+        self.stats = {"spawned": 0, "recycled": 0, "culled": 0, "dropped": 0, "landed": 0}
+        self._stats = [dict(self.stats) for _ in range(workers)]
+        self._counts = [0] * workers
+        self._save = False
+        self._spawns = []
+        self._spawn_cursor = 0
+        self._pending = None # Tlo koje čeka rezultat koraka u tijeku
+        self._flow = None # Mreža vjetra u dijeljenoj memoriji, stvara se uz prvu mrežu
+
+        bounds = np.linspace(0, capacity, workers + 1).astype(int)
+        self._starts = bounds[:-1].tolist()
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        names = [buffer.memory.name for buffer in self.buffers]
+        context = multiprocessing.get_context("fork") if mode == "process" else None
+        self.connections, self._workers = [], []
+        for i in range(workers):
+            ours, theirs = multiprocessing.Pipe()
+            arguments = (theirs, int(bounds[i]), int(bounds[i + 1]), capacity, names, width, height, options, seeds[i])
+            if context is None:
+                worker = threading.Thread(target=_worker_loop, args=arguments, daemon=True)
+            else:
+                worker = context.Process(target=_worker_loop, args=arguments, daemon=True)
+            worker.start()
+            self.connections.append(ours)
+            self._workers.append(worker)
+        self._in_flight = False
+
+    def render_state(self):
+        return self.buffers[self.front]
+
+    def save_state(self):
+        self._save = True
+
+    # Nove pahulje dijele se radnicima; ostatak dijeljenja ide redom različitim radnicima
+    def spawn(self, n, y):
+        self._spawns.append((n, y))
+        return n
+
+    def _split_spawns(self):
+        shares = [[] for _ in range(self.workers)]
+        for n, y in self._spawns:
+            base, extra = divmod(n, self.workers)
+            for i in range(self.workers):
+                share = base + ((i - self._spawn_cursor) % self.workers < extra)
+                if share:
+                    shares[i].append((share, y))
+            self._spawn_cursor = (self._spawn_cursor + extra) % self.workers
+        self._spawns = []
+        return shares
+
+    # Čeka rezultate koraka u tijeku, prebacuje crtanje na njegov međuspremnik i
+    # dodaje snijeg koji je pao u tom koraku
+    def wait(self):
+        if not self._in_flight:
+            return
+        snow, deposited = 0., 0
+        for i, connection in enumerate(self.connections):
+            self._counts[i], self._stats[i], fallen = connection.recv()
+            if fallen is not None:
+                snow, deposited = snow + fallen[0], deposited + fallen[1]
+        if self._pending is not None:
+            self._pending.snow += snow
+            self._pending.deposited += deposited
+        self._in_flight = False
+        self.front = 1 - self.front
+        self.buffers[self.front].compact(self._starts, self._counts)
+        self.count = self.buffers[self.front].count
+        self.stats = {key: sum(stats[key] for stats in self._stats) for key in self.stats}
+
+    def update(self, dt, wind=(), field=None, ground=None):
+        self.wait()
+        field_state = ground_state = None
+        if field is not None:
+            if self._flow is None or self._flow.shape != field.flow_u.shape:
+                if self._flow is not None:
+                    self._flow.close(unlink=True) # Radnici se prebacuju na novi blok po imenu
+                self._flow = SharedFlow(field.flow_u.shape)
+            np.copyto(self._flow.flow[0], field.flow_u)
+            np.copyto(self._flow.flow[1], field.flow_v)
+            field_state = (self._flow.memory.name, field.cell_size, field.coupling)
+        if ground is not None:
+            ground_state = (ground.column_width, ground.flake_volume, ground.surface.copy())
+        shares = self._split_spawns()
+        for connection, spawns in zip(self.connections, shares):
+            connection.send((self._save, spawns, dt, list(wind), field_state, ground_state, 1 - self.front))
+        self._save = False
+        self._pending = ground
+        self._in_flight = True
+
+    def close(self):
+        self.wait()
+        for connection in self.connections:
+            connection.send(None)
+        for worker in self._workers:
+            worker.join()
+        for buffer in self.buffers:
+            buffer.close(unlink=True)
+        if self._flow is not None:
+            self._flow.close(unlink=True)
@@ -0,0 +1,233 @@
+import numpy as np
+
+from spatial import SpatialGrid
+
+
+# Granice dubine slojeva (daleki, srednji, bliski) i smanjenje brzine rotacije po sloju
+LAYER_DEPTHS = (0.4, 0.7)
+LAYER_ROTATION_OFFSET = np.array([10., 5., 0.], dtype=np.float32)
+
+
+# previous + (current - previous) * alpha, upisano u out
+def lerp(previous, current, alpha, out):
+    np.subtract(current, previous, out=out)
+    out *= alpha
+    out += previous
+    return out
+
+
+# Sustav čestica u obliku strukture polja: svako svojstvo svih čestica je jedno
+# kontinuirano numpy polje, a žive čestice su uvijek na početku (indeksi 0..count-1).
+# Jedan poziv update() radi gravitaciju, nasumično podrhtavanje, vjetar i pomak za
+# sve čestice odjednom, a uklanjanje mrtvih čestica je maska + popunjavanje rupa
+# živim česticama s kraja, bez list.remove() po čestici.
+#
+# Sustav je ujedno bazen fiksnog kapaciteta: mjesta iza count su slobodna lista
+# (slobodna mjesta su uvijek na kraju), a spawn() ponovno koristi mjesta umrlih
+# čestica i iznova nasumično postavlja sva njihova svojstva. Sva polja, pa i pomoćna
+# za međurezultate, alociraju se jednom u konstruktoru; update(), cull() i spawn()
+# pišu samo u njih (out=), pa simulacija u ustaljenom stanju ne alocira memoriju.
+#
+# Izvora vjetra može biti više (više dodira, skriptirani naleti). Za njih se jednom po
+# koraku gradi prostorna mreža s ćelijama veličine radijusa vjetra, a svaki izvor
+# provjerava samo čestice iz ćelija koje njegov krug dodiruje. Privremena polja tih
+# upita su veličine broja obližnjih čestica, a ne svih čestica.
+# Umjesto (ili uz) točke vjetra može se zadati mreža brzine zraka (WindField) iz
+# koje svaka čestica bilinearno uzima brzinu na svom položaju.
+#
+# Za iscrtavanje s fiksnim korakom simulacije save_state() prije koraka pamti
+# položaj i rotaciju, a interpolate(alpha) daje stanje između prethodnog i trenutnog.
+# S tlom (SnowCover) pahulje ne nestaju ispod ekrana nego slijeću na površinu snijega.
+class ParticleSystem:
+    def __init__(self, width, height, capacity=100000, gravity=-80., wind_strength=3000.,
+                 wind_radius=50., rotation_speed=30., margin=50., seed=None):
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.gravity = gravity
+        self.wind_strength = wind_strength
+        self.wind_radius = wind_radius
+        self.base_rotation_speed = rotation_speed
+        self.margin = margin
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.high_water = 0 # Najveći broj mjesta ikad korištenih
+        self.stats = {"spawned": 0, "recycled": 0, "culled": 0, "dropped": 0, "landed": 0}
+
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.depth_factor = np.zeros(capacity, dtype=np.float32)
+        self.rotation = np.zeros(capacity, dtype=np.float32)
+        self.rotation_speed = np.zeros(capacity, dtype=np.float32)
+        self.layer = np.zeros(capacity, dtype=np.int8)
+        self.previous_position = np.zeros((capacity, 2), dtype=np.float32)
+        self.previous_rotation = np.zeros(capacity, dtype=np.float32)
+        self.arrays = (self.position, self.velocity, self.depth_factor, self.rotation, self.rotation_speed, self.layer,
+                       self.previous_position, self.previous_rotation)
+
+        # Pomoćna polja za međurezultate
+        self._k = np.empty(capacity, dtype=np.float32)
+        self._tmp = np.empty(capacity, dtype=np.float32)
+        self._dist = np.empty(capacity, dtype=np.float32)
+        self._vec = np.empty((capacity, 2), dtype=np.float32)
+        self._mask = np.empty(capacity, dtype=bool)
+        self._mask2 = np.empty(capacity, dtype=bool)
+        self._index = np.arange(capacity)
+        self._holes = np.empty(capacity, dtype=np.intp)
+        self._movers = np.empty(capacity, dtype=np.intp)
+        self._moved = tuple(np.empty_like(arr) for arr in self.arrays)
+        self._render_position = np.empty((capacity, 2), dtype=np.float32)
+        self._render_rotation = np.empty(capacity, dtype=np.float32)
+        self.grid = SpatialGrid(width, height, wind_radius, capacity)
+
+    # Sloj (0 daleki, 1 srednji, 2 bliski) za svaku živu česticu
+    def layers(self):
+        return self.layer[:self.count]
+
+    # Zauzima do n slobodnih mjesta za nove čestice na visini y, vraća broj dodanih.
+    # Kad je bazen pun, višak se ne dodaje nego broji kao "dropped".
+    def spawn(self, n, y):
+        requested, n = n, min(n, self.capacity - self.count)
+        self.stats["dropped"] += requested - max(n, 0)
+        if n <= 0:
+            return 0
+        start, end = self.count, self.count + n
+        rng, r, m = self.rng, self._tmp[:n], self._mask[:n]
+
+        rng.random(dtype=np.float32, out=r)
+        np.multiply(r, self.width, out=self.position[start:end, 0])
+        self.position[start:end, 1] = y
+        self.previous_position[start:end] = self.position[start:end]
+        self.velocity[start:end] = 0.
+        self.rotation[start:end] = 0.
+        self.previous_rotation[start:end] = 0.
+
+        depth = self.depth_factor[start:end]
+        rng.random(dtype=np.float32, out=depth)
+        depth *= 0.99 # Jednoliko u [0.01, 1.0)
+        depth += 0.01
+
+        layer = self.layer[start:end]
+        np.greater_equal(depth, LAYER_DEPTHS[0], out=m)
+        layer[:] = m
+        np.greater_equal(depth, LAYER_DEPTHS[1], out=m)
+        layer += m
+
+        speed = self.rotation_speed[start:end]
+        np.take(LAYER_ROTATION_OFFSET, layer, out=speed)
+        np.subtract(self.base_rotation_speed, speed, out=speed)
+        rng.random(dtype=np.float32, out=r)
+        np.less(r, 0.5, out=m)
+        np.negative(speed, out=speed, where=m) # Nasumičan smjer vrtnje
+
+        self.stats["spawned"] += n
+        self.stats["recycled"] += max(0, min(end, self.high_water) - start)
+        self.high_water = max(self.high_water, end)
+        self.count = end
+        return n
+
+    # Pamti trenutno stanje kao prethodno, prije koraka simulacije
+    def save_state(self):
+        n = self.count
+        np.copyto(self.previous_position[:n], self.position[:n])
+        np.copyto(self.previous_rotation[:n], self.rotation[:n])
+
+    # Položaji i rotacije živih čestica između prethodnog (alpha = 0) i trenutnog
+    # (alpha = 1) stanja; za alpha = 1 vraća sama polja stanja
+    def interpolate(self, alpha):
+        n = self.count
+        if alpha >= 1.:
+            return self.position[:n], self.rotation[:n]
+        return (lerp(self.previous_position[:n], self.position[:n], alpha, self._render_position[:n]),
+                lerp(self.previous_rotation[:n], self.rotation[:n], alpha, self._render_rotation[:n]))
+
+    # Stanje za iscrtavanje (vidi ParallelParticles.render_state)
+    def render_state(self):
+        return self
+
+    # Jedan korak simulacije; wind je niz (x, y) točaka vjetra (može biti prazan),
+    # field mreža brzine zraka ili None, a ground snježni pokrivač ili None
+    def update(self, dt, wind=(), field=None, ground=None):
+        n = self.count
+        if n == 0:
+            return
+        pos, vel, tmp = self.position[:n], self.velocity[:n], self._tmp[:n]
+        k = np.multiply(self.depth_factor[:n], 1.2, out=self._k[:n]) # Bliže pahulje jače reagiraju na sile
+
+        np.multiply(k, self.gravity * dt, out=tmp)
+        vel[:, 1] += tmp
+        self.rng.random(dtype=np.float32, out=tmp)
+        tmp *= 8.
+        tmp -= 4.
+        tmp *= k
+        vel[:, 0] += tmp
+
+        if len(wind):
+            self.apply_wind(wind, k, dt)
+        if field is not None:
+            air_u, air_v = field.sample(pos, (tmp, self._dist[:n]))
+            for air, column in ((air_u, 0), (air_v, 1)):
+                air *= k
+                air *= field.coupling * dt
+                vel[:, column] += air
+
+        np.multiply(vel, dt, out=self._vec[:n])
+        pos += self._vec[:n]
+        np.multiply(self.rotation_speed[:n], dt, out=tmp)
+        self.rotation[:n] += tmp
+        self.cull(ground)
+
+    # Vjetar iz svih točaka: mreža se gradi jednom, a svaki izvor dira samo svoje ćelije
+    def apply_wind(self, wind, k, dt):
+        self.grid.build(self.position, self.count)
+        for wx, wy in wind:
+            for candidates in self.grid.query(wx, wy, self.wind_radius):
+                self._blow(candidates, wx, wy, k, dt)
+
+    # Odguruje čestice candidates od točke (wx, wy): jedinični vektor od točke prema
+    # pahulji, samo unutar radijusa (pahulja točno u točki vjetra ne dobiva silu)
+    def _blow(self, candidates, wx, wy, k, dt):
+        d = self.position[candidates]
+        d[:, 0] -= wx
+        d[:, 1] -= wy
+        dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+        near = (dist < self.wind_radius) & (dist > 0.)
+        index, d, dist = candidates[near], d[near], dist[near]
+        force = k[index] / dist
+        force *= self.wind_strength * dt
+        d[:, 0] *= force
+        d[:, 1] *= force
+        self.velocity[index] += d
+
+    # Uklanja čestice izvan ekrana: rupe među prvih count - mrtvih mjesta popunjavaju
+    # se živim česticama s kraja, pa se kopira samo onoliko čestica koliko ih je umrlo.
+    # S tlom su mrtve i pahulje ispod površine snijega, koje se prije toga talože.
+    def cull(self, ground=None):
+        n, m = self.count, self.margin
+        x, y = self.position[:n, 0], self.position[:n, 1]
+        dead, other = self._mask[:n], self._mask2[:n]
+        if ground is None:
+            np.less(y, -m, out=dead)
+        else:
+            ground.landed(x, y, out=dead)
+            landed = int(np.count_nonzero(dead))
+            if landed:
+                ground.deposit(np.compress(dead, x, out=self._tmp[:landed]))
+                self.stats["landed"] += landed
+        np.less(x, -m, out=other)
+        dead |= other
+        np.greater(x, self.width + m, out=other)
+        dead |= other
+        dead_count = int(np.count_nonzero(dead))
+        if dead_count == 0:
+            return
+        alive_count = n - dead_count
+        front = dead[:alive_count]
+        moves = int(np.count_nonzero(front))
+        holes = np.compress(front, self._index[:alive_count], out=self._holes[:moves])
+        tail_alive = np.logical_not(dead[alive_count:], out=other[alive_count:])
+        movers = np.compress(tail_alive, self._index[alive_count:n], out=self._movers[:moves])
+        for arr, scratch in zip(self.arrays, self._moved):
+            arr[holes] = np.take(arr, movers, axis=0, out=scratch[:moves])
+        self.count = alive_count
+        self.stats["culled"] += dead_count
@@ -0,0 +1,208 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+import numpy as np
+
+
+MAGIC = b"SNOWREC1"
+ALIGN = 8 # Svaki stupac počinje na višekratniku 8 bajtova, da pogledi na njega budu poravnati
+
+# Polja koja se snimaju po toku: (ime, tip, broj vrijednosti po čestici). Imena su
+# ista kao atributi sustava, pa se snimljena sličica crta istim iscrtavačima.
+# Prozirnost pahulje je depth_factor, a emitera četvrti kanal boje.
+STREAMS = {
+    "snow": (("position", "<f4", 2), ("rotation", "<f4", 1), ("depth_factor", "<f4", 1), ("layer", "i1", 1)),
+    "emitters": (("position", "<f4", 2), ("rotation", "<f4", 1), ("size", "<f4", 2), ("uv", "<f4", 4),
+                 ("color", "<f4", 4)),
+    "cover": (("surface", "<f4", 1),),
+}
+
+FRAME_HEADER = struct.Struct("<Qd") # Veličina sličice u bajtovima i vrijeme simulacije
+
+
+def _padding(size):
+    return -size % ALIGN
+
+
+# Zapisuje snimku simulacije kao niz sličica u binarnu datoteku. Na početku je
+# MAGIC, duljina i JSON zaglavlje (tokovi s poljima i meta podaci, npr. opis
+# tekstura, da reprodukcija složi isti atlas). Svaka sličica je zaglavlje (veličina,
+# vrijeme, broj redaka po toku), a zatim stupci: sva polja jednog toka redom, svako
+# kao jedan kontinuirani blok, pa se polje sustava upisuje jednim write bez
+# pretvorbe po čestici. Datoteka se samo nadopunjava, pa je i prekinuta snimka
+# čitljiva do zadnje cijele sličice.
+class Recorder:
+    def __init__(self, path, streams=STREAMS, **meta):
+        self.streams = {name: tuple((field, np.dtype(dtype), width) for field, dtype, width in fields)
+                        for name, fields in streams.items()}
+        header = json.dumps({"streams": streams, "meta": meta}).encode()
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header + bytes(_padding(len(header) + 12)))
+        self.frames = 0
+        self.counts_size = 4 * len(streams)
+        self.counts_size += _padding(FRAME_HEADER.size + self.counts_size)
+
+    # Upisuje jednu sličicu; states preslikava ime toka u objekt s poljima toka.
+    # Snima se prvih count redaka (ili cijelo polje ako objekt nema count).
+    def write(self, time, **states):
+        counts = np.zeros(self.counts_size // 4, dtype="<u4")
+        columns, size = [], FRAME_HEADER.size + self.counts_size
+        for i, (name, fields) in enumerate(self.streams.items()):
+            state = states[name]
+            n = getattr(state, "count", None)
+            for field, dtype, width in fields:
+                column = getattr(state, field)[:n]
+                n = len(column)
+                columns.append(np.ascontiguousarray(column, dtype=dtype))
+                size += column.size * dtype.itemsize + _padding(column.size * dtype.itemsize)
+            counts[i] = n
+        self.file.write(FRAME_HEADER.pack(size, time))
+        self.file.write(counts.tobytes())
+        for column in columns:
+            self.file.write(column.data)
+            self.file.write(bytes(_padding(column.nbytes)))
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+
+# Stanje jednog toka u snimljenoj sličici: polja su pogledi u mapiranu datoteku,
+# bez kopiranja. Sučelje (count, capacity, layers, interpolate) isto je kao kod
+# ParticleSystem, pa ga ParticleRenderer i EmitterRenderer crtaju bez izmjena.
+class RecordedState:
+    def __init__(self, count, fields):
+        self.count = self.capacity = count
+        for field, array in fields.items():
+            setattr(self, field, array)
+
+    def layers(self):
+        return self.layer
+
+    # Sličice su snimljene po koracima simulacije, pa se prikazuju bez interpolacije
+    def interpolate(self, alpha):
+        return self.position, self.rotation
+
+
+# Snimka otvorena kao np.memmap: pri otvaranju se samo prolazi kroz zaglavlja
+# sličica (skok po veličini sličice) i pamte njihovi početci, a podaci sličice
+# čitaju se tek kad se ona zatraži, pa je skok na bilo koju sličicu jednako brz
+# neovisno o duljini snimke. Nedovršena zadnja sličica se zanemaruje.
+class Recording:
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:8]) != MAGIC:
+            raise ValueError("%s nije snimka simulacije" % path)
+        length = struct.unpack("<I", bytes(self.data[8:12]))[0]
+        header = json.loads(bytes(self.data[12:12 + length]))
+        self.meta = header["meta"]
+        self.streams = {name: tuple((field, np.dtype(dtype), width) for field, dtype, width in fields)
+                        for name, fields in header["streams"].items()}
+        self.counts_size = 4 * len(self.streams)
+        self.counts_size += _padding(FRAME_HEADER.size + self.counts_size)
+
+        offsets, times = [], []
+        offset, end = 12 + length + _padding(12 + length), len(self.data)
+        while offset + FRAME_HEADER.size <= end:
+            size, time = FRAME_HEADER.unpack(bytes(self.data[offset:offset + FRAME_HEADER.size]))
+            if size == 0 or offset + size > end:
+                break
+            offsets.append(offset)
+            times.append(time)
+            offset += size
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.times = np.array(times, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    # Indeks zadnje sličice snimljene do vremena time
+    def find(self, time):
+        return max(int(np.searchsorted(self.times, time, side="right")) - 1, 0)
+
+    # Stanja svih tokova sličice index, {ime toka: RecordedState}
+    def frame(self, index):
+        offset = int(self.offsets[index]) + FRAME_HEADER.size
+        counts = np.frombuffer(self.data, dtype="<u4", count=len(self.streams), offset=offset)
+        offset += self.counts_size
+        frame = {}
+        for (name, fields), n in zip(self.streams.items(), counts.tolist()):
+            arrays = {}
+            for field, dtype, width in fields:
+                array = np.frombuffer(self.data, dtype=dtype, count=n * width, offset=offset)
+                arrays[field] = array.reshape(n, width) if width > 1 else array
+                offset += array.nbytes + _padding(array.nbytes)
+            frame[name] = RecordedState(n, arrays)
+        return frame
+
+    def close(self):
+        self.data = None
+
+
+# Reprodukcija snimke: vrijeme teče brzinom speed (0 = pauza), a seek() i step()
+# premještaju reprodukciju na bilo koju sličicu (klizanje kroz snimku). Snimka bez
+# ijedne cijele sličice (npr. prekinuta prije prvog koraka) nema što prikazati,
+# pa se odbija odmah, a ne pri svakom iscrtavanju.
+class ReplayPlayer:
+    def __init__(self, recording, speed=1., loop=True):
+        if len(recording) == 0:
+            raise ValueError("snimka nema nijednu cijelu sličicu")
+        self.recording = recording
+        self.speed = speed
+        self.loop = loop
+        self.paused = False
+        self.index = 0
+        self.time = recording.times[0]
+
+    def advance(self, dt):
+        if self.paused:
+            return
+        times = self.recording.times
+        self.time += dt * self.speed
+        if self.time > times[-1]:
+            duration = times[-1] - times[0]
+            self.time = times[0] + (self.time - times[0]) % duration if self.loop and duration > 0 else times[-1]
+        self.index = self.recording.find(self.time)
+
+    def seek(self, index):
+        self.index = min(max(index, 0), len(self.recording) - 1)
+        self.time = self.recording.times[self.index]
+
+    # Pomak za delta sličica; reprodukcija se zaustavlja da se sličica može pregledati
+    def step(self, delta):
+        self.paused = True
+        self.seek(self.index + delta)
+
+    def frame(self):
+        return self.recording.frame(self.index)
+
+
+# Provjera: snimka bez sličica se odbija, a snimka s jednom sličicom reproducira
+if __name__ == "__main__":
+    class _State:
+        count = 2
+        surface = np.arange(4, dtype=np.float32)
+
+    failures = 0
+    directory = tempfile.mkdtemp()
+    empty, single = os.path.join(directory, "empty.rec"), os.path.join(directory, "single.rec")
+    Recorder(empty, streams={"cover": STREAMS["cover"]}).close()
+    try:
+        ReplayPlayer(Recording(empty))
+        print("prazna snimka: nije odbijena FAILED")
+        failures += 1
+    except ValueError as error:
+        print("prazna snimka: %s ok" % error)
+    recorder = Recorder(single, streams={"cover": STREAMS["cover"]})
+    recorder.write(0.5, cover=_State())
+    recorder.close()
+    player = ReplayPlayer(Recording(single))
+    player.advance(1.)
+    player.seek(-1)
+    ok = player.index == 0 and np.array_equal(player.frame()["cover"].surface, _State.surface[:2])
+    failures += not ok
+    print("jedna sličica: %s" % ("ok" if ok else "FAILED"))
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,388 @@
+import ctypes
+import os
+import numpy as np
+import pyglet
+from pyglet.gl import *
+from pyglet.image.atlas import TextureAtlas
+from pyglet.graphics.shader import Shader, ShaderProgram
+from pyglet.graphics.vertexarray import VertexArray
+
+
+# Svaka čestica je jedna točka (GL_POINTS) s podacima x, y, rotacija, skala i
+# prozirnost. Veličinu točke računa shader vrhova, a shader fragmenata zakreće
+# koordinate teksture unutar točke, pa nema četiri vrha po čestici ni Sprite objekta.
+# Koristi se samo OpenGL 3.3 core, što podržava i softverski Mesa llvmpipe.
+VERTEX_SOURCE = """#version 150 core
+in vec2 position;
+in float rotation;
+in float scale;
+in float opacity;
+
+uniform WindowBlock
+{
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform vec2 image_size;
+
+out float frag_rotation;
+out float frag_opacity;
+out float frag_point_size;
+
+void main() {
+    // Točka mora obuhvatiti i zakrenutu sliku, pa joj je stranica dijagonala slike
+    frag_point_size = length(image_size) * scale;
+    gl_PointSize = frag_point_size;
+    gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+    frag_rotation = radians(rotation);
+    frag_opacity = opacity;
+}
+"""
+
+FRAGMENT_SOURCE = """#version 150 core
+in float frag_rotation;
+in float frag_opacity;
+in float frag_point_size;
+
+uniform sampler2D sprite_texture;
+uniform vec2 image_size;
+uniform vec4 uv_rect; // početak i veličina slike u teksturi (atlasu)
+
+out vec4 final_color;
+
+void main() {
+    // Pomak od središta točke u pikselima (y prema gore), zakrenut natrag u prostor
+    // slike. Rotacija je u stupnjevima u smjeru kazaljke na satu, kao kod Sprite.
+    vec2 offset = vec2(gl_PointCoord.x - 0.5, 0.5 - gl_PointCoord.y) * frag_point_size;
+    float c = cos(frag_rotation), s = sin(frag_rotation);
+    vec2 local = vec2(c * offset.x - s * offset.y, s * offset.x + c * offset.y);
+    vec2 scale = image_size * frag_point_size / length(image_size);
+    vec2 uv = local / scale + 0.5;
+    if (any(lessThan(uv, vec2(0.0))) || any(greaterThan(uv, vec2(1.0))))
+        discard;
+    final_color = texture(sprite_texture, uv_rect.xy + uv * uv_rect.zw) * vec4(1.0, 1.0, 1.0, frag_opacity);
+}
+"""
+
+VERTEX_ATTRIBUTES = (("position", 2), ("rotation", 1), ("scale", 1), ("opacity", 1))
+
+_program = None
+
+
+def get_point_sprite_program():
+    global _program
+    if _program is None:
+        _program = ShaderProgram(Shader(VERTEX_SOURCE, 'vertex'), Shader(FRAGMENT_SOURCE, 'fragment'))
+    return _program
+
+
+# Jedan trajni međuspremnik vrhova za jedan sloj. Atributi nisu isprepleteni nego
+# svaki ima svoj blok (sve x, y, pa sve rotacije, ...), pa se čestice sloja iz polja
+# sustava prepisuju s np.take izravno u pomoćno polje, bez kopiranja redak po redak.
+# Cijelo polje se zatim šalje jednim glBufferData (stari sadržaj se odbacuje).
+class PointSpriteLayer:
+    def __init__(self, program, attributes=VERTEX_ATTRIBUTES):
+        self.program = program
+        self.attributes = attributes
+        self.floats = sum(size for _, size in attributes)
+        self.locations = [program.attributes[name]['location'] for name, _ in attributes]
+        self.count = 0
+        self.staging = np.empty(0, dtype=np.float32)
+        self.vao = VertexArray()
+        buffer_id = GLuint()
+        glGenBuffers(1, buffer_id)
+        self.vbo = buffer_id.value
+
+    # index odabire čestice sloja iz polja sources (po jedno za svaki atribut);
+    # ako je index broj n, uzima se prvih n čestica redom
+    def upload(self, index, *sources):
+        n = index if isinstance(index, int) else len(index)
+        if len(self.staging) < n * self.floats:
+            self.staging = np.empty(2 * n * self.floats, dtype=np.float32)
+        blocks, offset = [], 0
+        for (_, size), source in zip(self.attributes, sources):
+            block = self.staging[offset:offset + n * size].reshape((n, size) if size > 1 else n)
+            if isinstance(index, int):
+                np.copyto(block, source[:n])
+            else:
+                np.take(source, index, axis=0, out=block)
+            blocks.append(offset * 4)
+            offset += n * size
+
+        self.vao.bind()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, offset * 4, self.staging.ctypes.data_as(ctypes.c_void_p), GL_STREAM_DRAW)
+        for location, (_, size), start in zip(self.locations, self.attributes, blocks):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, 0, start)
+        self.vao.unbind()
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.count = n
+
+    def draw(self):
+        if self.count == 0:
+            return
+        self.vao.bind()
+        glDrawArrays(GL_POINTS, 0, self.count)
+        self.vao.unbind()
+
+
+# Iscrtavač čestica iz ParticleSystem: jedna tekstura i po jedan međuspremnik za
+# svaki sloj dubine (daleki, srednji, bliski), iscrtani tim redom.
+# Skala i prozirnost ovise o dubini kao kod ranijih Sprite pahulja.
+class ParticleRenderer:
+    def __init__(self, texture, layers=3, base_scale=0.05, depth_scale=0.1):
+        self.texture = texture
+        self.program = get_point_sprite_program()
+        self.layers = [PointSpriteLayer(self.program) for _ in range(layers)]
+        self.base_scale = base_scale
+        self.depth_scale = depth_scale
+        # Izrezak slike u teksturi: tex_coords su (u, v, r) za četiri kuta počevši od donjeg lijevog
+        u0, v0, _, _, _, _, u1, v1, _, _, _, _ = texture.tex_coords
+        self.uv_rect = (u0, v0, u1 - u0, v1 - v0)
+        self.image_size = (texture.width, texture.height)
+        self.scale, self.mask = np.empty(0, dtype=np.float32), np.empty(0, dtype=bool)
+        self.index = self.selected = np.empty(0, dtype=np.intp)
+
+    # Indeksi čestica po sloju i skala pišu se u pomoćna polja veličine kapaciteta
+    # sustava, alocirana jednom, pa upload u ustaljenom stanju ne alocira.
+    # alpha < 1 iscrtava stanje između zadnja dva koraka simulacije.
+    def upload(self, system, alpha=1.):
+        n = system.count
+        if len(self.scale) < n:
+            self.scale = np.empty(system.capacity, dtype=np.float32)
+            self.mask = np.empty(system.capacity, dtype=bool)
+            self.index = np.arange(system.capacity)
+            self.selected = np.empty(system.capacity, dtype=np.intp)
+        layer, mask = system.layers(), self.mask[:n]
+        depth = system.depth_factor[:n]
+        scale = np.multiply(depth, self.depth_scale, out=self.scale[:n])
+        scale += self.base_scale
+        position, rotation = system.interpolate(alpha)
+        for l, buffer in enumerate(self.layers):
+            np.equal(layer, l, out=mask)
+            selected = np.compress(mask, self.index[:n], out=self.selected[:int(np.count_nonzero(mask))])
+            buffer.upload(selected, position, rotation, scale, depth)
+
+    def draw(self):
+        program = self.program
+        program.use()
+        program['image_size'] = self.image_size
+        program['uv_rect'] = self.uv_rect
+        begin_point_sprites(program, self.texture)
+        for buffer in self.layers:
+            buffer.draw()
+        end_point_sprites(program)
+
+
+# Zajedničko stanje za crtanje točaka sa slikom: tekstura, veličina točke iz shadera
+# i miješanje po prozirnosti
+def begin_point_sprites(program, texture):
+    program['sprite_texture'] = 0
+    glActiveTexture(GL_TEXTURE0)
+    glBindTexture(texture.target, texture.id)
+    glEnable(GL_PROGRAM_POINT_SIZE)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+
+def end_point_sprites(program):
+    glDisable(GL_BLEND)
+    glDisable(GL_PROGRAM_POINT_SIZE)
+    program.stop()
+
+
+# Slike iz opisa textures ({ime: {"file": ..., "alpha": ...}}) u jednom atlasu, da
+# sve čestice mogu koristiti istu teksturu. BMP slike nemaju prozirnost, pa se
+# ona računa iz svjetline: "luminance" (dim, snijeg) daje bijelu sliku kojoj je
+# prozirnost svjetlina, a "colorkey" (baloni) samo crnu pozadinu čini prozirnom.
+# Crno-bijele slike (npr. balloon.bmp) pretvaraju se u RGBA, jer ih OpenGL 3.3
+# core ne može izravno učitati. Vraća teksturu atlasa i za svaku sliku
+# (uv_rect, (širina, visina)) te izrezak teksture.
+def build_atlas(textures, directory=".", size=1024):
+    atlas = TextureAtlas(size, size)
+    sprites, regions = {}, {}
+    for name, spec in textures.items():
+        image = pyglet.image.load(os.path.join(directory, spec["file"])).get_image_data()
+        w, h = image.width, image.height
+        pixels = np.frombuffer(image.get_data('RGBA', w * 4), dtype=np.uint8).reshape(h, w, 4).copy()
+        luminance = pixels[..., :3].max(axis=2)
+        if spec.get("alpha", "luminance") == "luminance":
+            pixels[..., 3] = luminance.astype(np.uint16) * 255 // max(int(luminance.max()), 1)
+            pixels[..., :3] = 255
+        else:
+            pixels[..., 3] = np.where(luminance > spec.get("threshold", 8), 255, 0)
+        # Prozirni rub od jednog piksela: atlas ne briše teksturu, pa bi linearno
+        # filtriranje na rubu slike inače uzimalo nedefinirane susjedne piksele
+        pixels = np.pad(pixels, ((1, 1), (1, 1), (0, 0)))
+        padded = atlas.add(pyglet.image.ImageData(w + 2, h + 2, 'RGBA', pixels.tobytes()))
+        regions[name] = padded.get_region(1, 1, w, h)
+        u0, v0, _, _, _, _, u1, v1, _, _, _, _ = regions[name].tex_coords
+        sprites[name] = ((u0, v0, u1 - u0, v1 - v0), (w, h))
+    return atlas.texture, sprites, regions
+
+
+# Točke za sve emitere (EmitterSystem) u jednom pozivu crtanja: veličina, izrezak
+# atlasa i boja su atributi svake točke, a ne uniformne varijable
+EMITTER_VERTEX_SOURCE = """#version 150 core
+in vec2 position;
+in float rotation;
+in vec2 size;
+in vec4 uv_rect;
+in vec4 color;
+
+uniform WindowBlock
+{
+    mat4 projection;
+    mat4 view;
+} window;
+
+out float frag_rotation;
+out float frag_point_size;
+out vec2 frag_size;
+out vec4 frag_uv_rect;
+out vec4 frag_color;
+
+void main() {
+    frag_point_size = length(size);
+    gl_PointSize = frag_point_size;
+    gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+    frag_rotation = radians(rotation);
+    frag_size = size;
+    frag_uv_rect = uv_rect;
+    frag_color = color;
+}
+"""
+
+EMITTER_FRAGMENT_SOURCE = """#version 150 core
+in float frag_rotation;
+in float frag_point_size;
+in vec2 frag_size;
+in vec4 frag_uv_rect;
+in vec4 frag_color;
+
+uniform sampler2D sprite_texture;
+
+out vec4 final_color;
+
+void main() {
+    vec2 offset = vec2(gl_PointCoord.x - 0.5, 0.5 - gl_PointCoord.y) * frag_point_size;
+    float c = cos(frag_rotation), s = sin(frag_rotation);
+    vec2 local = vec2(c * offset.x - s * offset.y, s * offset.x + c * offset.y);
+    vec2 uv = local / frag_size + 0.5;
+    if (any(lessThan(uv, vec2(0.0))) || any(greaterThan(uv, vec2(1.0))))
+        discard;
+    final_color = texture(sprite_texture, frag_uv_rect.xy + uv * frag_uv_rect.zw) * frag_color;
+}
+"""
+
+EMITTER_ATTRIBUTES = (("position", 2), ("rotation", 1), ("size", 2), ("uv_rect", 4), ("color", 4))
+
+_emitter_program = None
+
+
+def get_emitter_program():
+    global _emitter_program
+    if _emitter_program is None:
+        _emitter_program = ShaderProgram(Shader(EMITTER_VERTEX_SOURCE, 'vertex'),
+                                         Shader(EMITTER_FRAGMENT_SOURCE, 'fragment'))
+    return _emitter_program
+
+
+class EmitterRenderer:
+    def __init__(self, texture):
+        self.texture = texture
+        self.program = get_emitter_program()
+        self.buffer = PointSpriteLayer(self.program, EMITTER_ATTRIBUTES)
+
+    def upload(self, system):
+        self.buffer.upload(system.count, system.position, system.rotation, system.size, system.uv, system.color)
+
+    def draw(self):
+        self.program.use()
+        begin_point_sprites(self.program, self.texture)
+        self.buffer.draw()
+        end_point_sprites(self.program)
+
+
+STRIP_VERTEX_SOURCE = """#version 150 core
+in vec2 position;
+in vec4 color;
+
+uniform WindowBlock
+{
+    mat4 projection;
+    mat4 view;
+} window;
+
+out vec4 frag_color;
+
+void main() {
+    gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+    frag_color = color;
+}
+"""
+
+STRIP_FRAGMENT_SOURCE = """#version 150 core
+in vec4 frag_color;
+out vec4 final_color;
+
+void main() {
+    final_color = frag_color;
+}
+"""
+
+_strip_program = None
+
+
+def get_strip_program():
+    global _strip_program
+    if _strip_program is None:
+        _strip_program = ShaderProgram(Shader(STRIP_VERTEX_SOURCE, 'vertex'), Shader(STRIP_FRAGMENT_SOURCE, 'fragment'))
+    return _strip_program
+
+
+# Snježni pokrivač (SnowCover) kao jedna traka trokuta (GL_TRIANGLE_STRIP): za
+# svaki stupac vrh na dnu ekrana i vrh na površini snijega. Boje se ne mijenjaju,
+# a visine vrhova na površini prepisuju se iz cover.surface prije svakog crtanja.
+class SnowCoverRenderer:
+    def __init__(self, cover, top_color=(1., 1., 1., 1.), bottom_color=(0.7, 0.75, 0.85, 1.)):
+        self.cover = cover
+        self.program = get_strip_program()
+        count = 2 * cover.columns
+        # Blok položaja (x, y po vrhu) pa blok boja, naizmjence dno i površina
+        self.staging = np.zeros(count * 6, dtype=np.float32)
+        self.position = self.staging[:count * 2].reshape(count, 2)
+        self.position[:, 0] = np.repeat(cover.x, 2)
+        colors = self.staging[count * 2:].reshape(count, 4)
+        colors[0::2] = bottom_color
+        colors[1::2] = top_color
+        self.count = count
+
+        self.vao = VertexArray()
+        buffer_id = GLuint()
+        glGenBuffers(1, buffer_id)
+        self.vbo = buffer_id.value
+        self.vao.bind()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.staging.nbytes, None, GL_STREAM_DRAW)
+        for name, size, start in (("position", 2, 0), ("color", 4, count * 2 * 4)):
+            location = self.program.attributes[name]['location']
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, 0, start)
+        self.vao.unbind()
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def upload(self):
+        self.position[1::2, 1] = self.cover.surface
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.staging.nbytes, self.staging.ctypes.data_as(ctypes.c_void_p), GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        self.program.use()
+        self.vao.bind()
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, self.count)
+        self.vao.unbind()
+        self.program.stop()
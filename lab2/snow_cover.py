@@ -0,0 +1,79 @@
+import numpy as np
+
+
+# Snježni pokrivač kao 1D visinska mapa: stupci širine column_width, svaki s
+# visinom podloge (tlo i prepreke) i visinom snijega na njoj. Pahulja koja padne
+# ispod površine stupca u kojem se nalazi "sleti": sustav čestica je uklanja, a
+# deposit() jednim bincount-om dodaje sve sletjele pahulje u njihove stupce.
+# step() zatim nekoliko puta izravnava strme razlike susjednih stupaca (snijeg se
+# osipa prema nižem susjedu kad je razlika veća od talus) i po želji topi snijeg.
+# Cijena step() ovisi samo o broju stupaca, a ne o broju čestica.
+#
+# Prepreke su krugovi koji prema dolje sežu do tla (kao brežuljak), pa snijeg
+# pada na njihov gornji rub.
+class SnowCover:
+    def __init__(self, width, column_width=4., flake_volume=6., talus=2., relax_rate=0.25,
+                 iterations=4, melt=0.):
+        self.column_width = float(column_width)
+        self.columns = int(np.ceil(width / column_width)) + 1
+        self.flake_volume = flake_volume # Površina snijega koju donese jedna pahulja (px^2)
+        self.talus = talus # Najveća stabilna razlika visina susjednih stupaca
+        self.relax_rate = relax_rate
+        self.iterations = iterations
+        self.melt = melt # Topljenje u pikselima po sekundi
+        self.deposited = 0 # Ukupan broj sletjelih pahulja
+
+        self.x = np.arange(self.columns, dtype=np.float32) * self.column_width
+        self.base = np.zeros(self.columns, dtype=np.float32)
+        self.snow = np.zeros(self.columns, dtype=np.float32)
+        self.surface = np.zeros(self.columns, dtype=np.float32)
+        self._scratch_size = 0
+
+    def add_obstacle(self, x, y, radius):
+        dx = self.x - x
+        inside = np.abs(dx) < radius
+        top = y + np.sqrt(np.maximum(radius * radius - dx * dx, 0.))
+        np.maximum(self.base, np.where(inside, top, 0.), out=self.base)
+        np.add(self.base, self.snow, out=self.surface)
+
+    # Stupac najbliži svakoj x koordinati, upisan u pomoćno polje
+    def _columns(self, x):
+        n = len(x)
+        if self._scratch_size < n:
+            self._scratch_size = n
+            self._f = np.empty(n, dtype=np.float32)
+            self._i = np.empty(n, dtype=np.intp)
+        f, index = self._f[:n], self._i[:n]
+        np.multiply(x, 1. / self.column_width, out=f)
+        f += 0.5
+        np.clip(f, 0, self.columns - 1, out=f)
+        index[:] = f
+        return index
+
+    # Maska pahulja koje su na položajima (x, y) ispod površine
+    def landed(self, x, y, out):
+        height = np.take(self.surface, self._columns(x), out=self._f[:len(x)])
+        return np.less(y, height, out=out)
+
+    # Dodaje snijeg sletjelih pahulja (x koordinate) u njihove stupce
+    def deposit(self, x):
+        if len(x) == 0:
+            return
+        counts = np.bincount(self._columns(x), minlength=self.columns)
+        self.snow += counts * np.float32(self.flake_volume / self.column_width)
+        self.deposited += len(x)
+
+    def step(self, dt):
+        if self.melt:
+            self.snow -= self.melt * dt
+            np.maximum(self.snow, 0., out=self.snow)
+        for _ in range(self.iterations):
+            np.add(self.base, self.snow, out=self.surface)
+            # Pozitivan tok prenosi snijeg iz desnog stupca u lijevi. Svaki stupac ima
+            # dva susjeda, pa mu se u jednom prolazu uzima najviše pola snijega po susjedu.
+            diff = self.surface[1:] - self.surface[:-1]
+            flow = np.sign(diff) * np.maximum(np.abs(diff) - self.talus, 0.) * self.relax_rate
+            np.clip(flow, -0.5 * self.snow[:-1], 0.5 * self.snow[1:], out=flow)
+            self.snow[:-1] += flow
+            self.snow[1:] -= flow
+        np.add(self.base, self.snow, out=self.surface)
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+# Jednolika mreža (prostorni hash) nad položajima čestica. Svaka čestica dobiva
+# ključ (ćelija << shift) | indeks, ključevi se sortiraju na mjestu, pa su čestice
+# iste ćelije susjedne u polju items, a ćelije jednog retka mreže čine jedan
+# neprekinut odsječak. Upit za krug tako vraća nekoliko odsječaka (po jedan za
+# svaki redak ćelija koje krug dodiruje) umjesto provjere svih čestica.
+# Čestice izvan mreže (iznad vrha, u rubu za brisanje) pripadaju rubnim ćelijama,
+# pa upiti ostaju točni, a konačnu provjeru udaljenosti radi pozivatelj.
+class SpatialGrid:
+    def __init__(self, width, height, cell_size, capacity):
+        self.cell_size = float(cell_size)
+        self.cols = max(1, int(np.ceil(width / cell_size)))
+        self.rows = max(1, int(np.ceil(height / cell_size)))
+        self.cells = self.cols * self.rows
+        self.shift = int(capacity).bit_length()
+        self.count = 0
+
+        self._f = np.empty(capacity, dtype=np.float32)
+        self._cx = np.empty(capacity, dtype=np.int64)
+        self._key = np.empty(capacity, dtype=np.int64)
+        self._index = np.arange(capacity, dtype=np.int64)
+        self.items = np.empty(capacity, dtype=np.int64) # Indeksi čestica poredani po ćelijama
+        self.sorted_cells = np.empty(capacity, dtype=np.int64)
+        self.start = np.zeros(self.cells + 1, dtype=np.int64) # Početak svake ćelije u items, start[0] je uvijek 0
+
+    # Ćelija (stupac ili redak) za koordinate, ograničena na mrežu
+    def _cell_coords(self, coords, limit, out):
+        f = self._f[:len(coords)]
+        np.multiply(coords, 1. / self.cell_size, out=f)
+        np.clip(f, 0, limit - 1, out=f)
+        out[:] = f # Nakon ograničenja su vrijednosti nenegativne, pa je odsijecanje isto što i floor
+        return out
+
+    def build(self, position, n):
+        self.count = n
+        if n == 0:
+            self.start[:] = 0
+            return
+        cx = self._cell_coords(position[:n, 0], self.cols, self._cx[:n])
+        key = self._cell_coords(position[:n, 1], self.rows, self._key[:n])
+        key *= self.cols
+        key += cx
+        key <<= self.shift
+        key |= self._index[:n]
+        key.sort() # Na mjestu; između sličica je polje gotovo sortirano
+        np.bitwise_and(key, (1 << self.shift) - 1, out=self.items[:n])
+        np.right_shift(key, self.shift, out=self.sorted_cells[:n])
+        # Broj čestica po ćeliji, a njegov kumulativni zbroj upisuje se u postojeće polje start
+        np.cumsum(np.bincount(self.sorted_cells[:n], minlength=self.cells), out=self.start[1:])
+
+    def _range(self, lo, hi, limit):
+        return (min(max(int(lo // self.cell_size), 0), limit - 1),
+                min(max(int(hi // self.cell_size), 0), limit - 1))
+
+    # Odsječci polja items s česticama iz ćelija koje dodiruje krug (x, y, radius)
+    def query(self, x, y, radius):
+        cx0, cx1 = self._range(x - radius, x + radius, self.cols)
+        cy0, cy1 = self._range(y - radius, y + radius, self.rows)
+        for cy in range(cy0, cy1 + 1):
+            a, b = self.start[cy * self.cols + cx0], self.start[cy * self.cols + cx1 + 1]
+            if b > a:
+                yield self.items[a:b]
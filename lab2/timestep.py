@@ -0,0 +1,40 @@
+# Fiksni korak simulacije: stvarno proteklo vrijeme skuplja se u akumulator, iz
+# kojeg se simulacija izvodi u cijelim koracima duljine dt (svaki podijeljen na
+# substeps podkoraka). Ostatak akumulatora određuje koliko je prikaz između
+# zadnja dva stanja (alpha), pa iscrtavanje interpolira umjesto da skače.
+# Ako simulacija ne stiže, izvodi se najviše max_steps koraka po pozivu, a višak
+# vremena se odbacuje, da zaostajanje ne raste iz sličice u sličicu.
+class FixedTimestep:
+    def __init__(self, rate=60., substeps=1, max_steps=5):
+        self.dt = 1. / rate
+        self.substeps = max(1, substeps)
+        self.max_steps = max_steps
+        self.accumulator = 0.
+        self.steps = 0 # Ukupan broj izvedenih koraka
+        self.dropped = 0. # Ukupno odbačeno vrijeme u sekundama
+
+    # Izvodi sve korake koji stanu u proteklo vrijeme; begin_step() se poziva prije
+    # svakog koraka (spremanje prethodnog stanja), step(dt) za svaki podkorak, a
+    # end_step() (ako je zadan) nakon cijelog koraka. Vraća broj izvedenih koraka.
+    def advance(self, elapsed, begin_step, step, end_step=None):
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.max_steps:
+            begin_step(self.dt)
+            for _ in range(self.substeps):
+                step(self.dt / self.substeps)
+            if end_step is not None:
+                end_step()
+            self.accumulator -= self.dt
+            steps += 1
+        if self.accumulator >= self.dt:
+            dropped = self.accumulator - self.accumulator % self.dt
+            self.dropped += dropped
+            self.accumulator -= dropped
+        self.steps += steps
+        return steps
+
+    # Udio puta od prethodnog do trenutnog stanja za iscrtavanje
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
@@ -0,0 +1,140 @@
+import numpy as np
+
+
+# Gruba mreža brzine zraka (u, v) u pikselima po sekundi, s čvorovima svakih
+# cell_size piksela. Izvori (miš, naleti) pišu u mrežu, a step() je prenosi samu
+# sobom (semi-Lagrangeova advekcija kao u "stable fluids"), prigušuje i dodaje
+# vrtložni šum. Čestice zatim jednim vektoriziranim dohvatom uzimaju bilinearno
+# interpoliranu brzinu na svom položaju, pa cijena koraka mreže ovisi samo o
+# njenoj rezoluciji, a ne o broju čestica.
+#
+# Vrtložni (curl) šum je zbroj nekoliko putujućih valova potencijala psi s
+# nasumičnim smjerovima; brzina (dpsi/dy, -dpsi/dx) je okomita na smjer vala, pa
+# je polje bez divergencije i ne skuplja pahulje na jedno mjesto.
+# Prepreke su čvorovi u kojima je zrak uvijek miran.
+class WindField:
+    def __init__(self, width, height, cell_size=20., decay=2., coupling=1., turbulence=0.,
+                 noise_scale=300., noise_speed=0.3, noise_modes=8, advection=True, seed=None):
+        self.cell_size = float(cell_size)
+        self.cols = int(np.ceil(width / cell_size)) + 1
+        self.rows = int(np.ceil(height / cell_size)) + 1
+        self.decay = decay # Prigušenje po sekundi
+        self.coupling = coupling # Koliko brzina zraka ubrzava pahulje
+        self.turbulence = turbulence # Najveća brzina vrtložnog šuma
+        self.advection = advection
+        self.time = 0.
+
+        ys, xs = np.mgrid[0:self.rows, 0:self.cols].astype(np.float32)
+        self.x, self.y = xs * self.cell_size, ys * self.cell_size # Položaji čvorova
+        self.u = np.zeros((self.rows, self.cols), dtype=np.float32)
+        self.v = np.zeros_like(self.u)
+        self.flow_u = np.zeros_like(self.u) # Konačno polje: zrak + šum, nula u preprekama
+        self.flow_v = np.zeros_like(self.u)
+        self.solid = np.zeros((self.rows, self.cols), dtype=bool)
+
+        rng = np.random.default_rng(seed)
+        angle = rng.uniform(0, 2 * np.pi, noise_modes)
+        wavenumber = 2 * np.pi / (noise_scale * rng.uniform(0.5, 1.5, noise_modes))
+        self._waves = list(zip(np.cos(angle) * wavenumber, np.sin(angle) * wavenumber,
+                               2 * np.pi * noise_speed * rng.uniform(0.5, 1.5, noise_modes),
+                               rng.uniform(0, 2 * np.pi, noise_modes)))
+        self._noise_amplitude = 1. / np.sqrt(noise_modes)
+        self._scratch_size = 0
+
+    # Raspon čvorova (redci, stupci) koje dodiruje krug, ograničen na mrežu
+    def _block(self, x, y, radius):
+        c = self.cell_size
+        i0, i1 = max(int(np.ceil((x - radius) / c)), 0), min(int((x + radius) // c) + 1, self.cols)
+        j0, j1 = max(int(np.ceil((y - radius) / c)), 0), min(int((y + radius) // c) + 1, self.rows)
+        return slice(j0, j1), slice(i0, i1)
+
+    # Radijalni izvor: zrak unutar radijusa ubrzava od točke (x, y) prema van
+    def add_radial(self, x, y, radius, strength, dt):
+        block = self._block(x, y, radius)
+        dx, dy = self.x[block] - x, self.y[block] - y
+        dist = np.hypot(dx, dy)
+        near = (dist < radius) & (dist > 0.)
+        scale = np.divide(strength * dt, dist, out=np.zeros_like(dist), where=near)
+        self.u[block] += dx * scale
+        self.v[block] += dy * scale
+
+    # Usmjereni izvor (nalet): zrak unutar radijusa ubrzava u smjeru (ax, ay)
+    def add_directional(self, x, y, radius, ax, ay, dt):
+        block = self._block(x, y, radius)
+        near = np.hypot(self.x[block] - x, self.y[block] - y) < radius
+        self.u[block] += near * np.float32(ax * dt)
+        self.v[block] += near * np.float32(ay * dt)
+
+    # Kružna prepreka u kojoj zrak miruje
+    def add_obstacle(self, x, y, radius):
+        block = self._block(x, y, radius)
+        self.solid[block] |= np.hypot(self.x[block] - x, self.y[block] - y) < radius
+
+    def step(self, dt):
+        self.time += dt
+        if self.advection:
+            # Svaki čvor preuzima brzinu s mjesta s kojeg bi ga zrak donio u ovom koraku
+            self.u, self.v = self._bilinear((self.u, self.v), self.x - self.u * dt, self.y - self.v * dt)
+        damping = np.float32(np.exp(-self.decay * dt))
+        self.u *= damping
+        self.v *= damping
+        self.u[self.solid] = 0.
+        self.v[self.solid] = 0.
+
+        np.copyto(self.flow_u, self.u)
+        np.copyto(self.flow_v, self.v)
+        if self.turbulence:
+            amplitude = self.turbulence * self._noise_amplitude
+            for kx, ky, omega, phase in self._waves:
+                wave = np.cos(kx * self.x + ky * self.y + (omega * self.time + phase))
+                wave *= amplitude / np.hypot(kx, ky)
+                self.flow_u += wave * ky
+                self.flow_v -= wave * kx
+            self.flow_u[self.solid] = 0.
+            self.flow_v[self.solid] = 0.
+
+    # Pomoćna polja za dohvat, povećavaju se samo kad čestica ima više nego ikad
+    def _scratch(self, n):
+        if self._scratch_size < n:
+            self._scratch_size = n
+            self._float = tuple(np.empty(n, dtype=np.float32) for _ in range(4))
+            self._corners = tuple(np.empty(n, dtype=np.intp) for _ in range(4))
+        return [arr[:n] for arr in self._float], [arr[:n] for arr in self._corners]
+
+    # Bilinearna interpolacija polja fields u točkama (x, y); točke izvan mreže
+    # uzimaju vrijednost s ruba. Bez outs rezultat su nova polja (za samu mrežu).
+    def _bilinear(self, fields, x, y, outs=None):
+        if outs is None:
+            outs = [np.empty(x.shape, dtype=np.float32) for _ in fields]
+        x, y = x.reshape(-1), y.reshape(-1)
+        (gx, gy, a, b), corners = self._scratch(len(x))
+        lower_left, lower_right, upper_left, upper_right = corners
+        for g, coord, limit, index in ((gx, x, self.cols, lower_right), (gy, y, self.rows, upper_left)):
+            np.multiply(coord, 1. / self.cell_size, out=g)
+            np.clip(g, 0., limit - 1.001, out=g)
+            np.floor(g, out=a)
+            index[:] = a
+            g -= a # Udio puta do sljedećeg čvora
+        # Indeksi četiri susjedna čvora u spljoštenoj mreži, zajednički za sva polja
+        np.multiply(upper_left, self.cols, out=lower_left)
+        lower_left += lower_right
+        np.add(lower_left, 1, out=lower_right)
+        np.add(lower_left, self.cols, out=upper_left)
+        np.add(upper_left, 1, out=upper_right)
+        for field, out in zip(fields, outs):
+            flat, out = field.reshape(-1), out.reshape(-1)
+            for (left, right), target in (((lower_left, lower_right), out), ((upper_left, upper_right), a)):
+                # Redak čvorova: lijevi + (desni - lijevi) * gx
+                np.take(flat, left, out=target)
+                np.take(flat, right, out=b)
+                b -= target
+                b *= gx
+                target += b
+            a -= out # Između redaka: donji + (gornji - donji) * gy
+            a *= gy
+            out += a
+        return outs
+
+    # Brzina zraka na položajima čestica, upisana u outs = (u, v)
+    def sample(self, position, outs):
+        return self._bilinear((self.flow_u, self.flow_v), position[:, 0], position[:, 1], outs)
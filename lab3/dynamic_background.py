@@ -1,7 +1,9 @@
+import functools
 import pygame
 import sys
 import random
 import json
+import numpy as np
 from pygame.locals import *
 
 def load_settings():
@@ -16,17 +18,34 @@ settings = load_settings()
 
 GRADIENT_TOP_COLOR = list(map(int, settings["Colors"]["GRADIENT_TOP_COLOR"]))[:3]
 GRADIENT_BOTTOM_COLOR = list(map(int, settings["Colors"]["GRADIENT_BOTTOM_COLOR"]))[:3]
+GRADIENT_QUANTUM = 4  # Redraw the cached gradient once a color channel drifts this far
+BACKGROUND_SHAPES = settings["Game World"]["BACKGROUND_SHAPES"]
+SHAPE_STYLES = 48  # Distinct looks the background shapes are drawn from
 
 class DynamicBackground:
-    def __init__(self, screen_width, screen_height):
+    def __init__(self, screen_width, screen_height, shape_count=BACKGROUND_SHAPES):
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.top_color = pygame.Color(GRADIENT_TOP_COLOR)  
         self.bottom_color = pygame.Color(GRADIENT_BOTTOM_COLOR)
+
+        # Cached gradient: a 1-pixel column scaled to the full screen, redrawn only
+        # when the interpolated colors move GRADIENT_QUANTUM or more from it
+        self.gradient_column = pygame.Surface((1, screen_height))
+        self.gradient = pygame.Surface((screen_width, screen_height))
+        self.gradient_colors = None
         
-        self.shapes = []
-        for _ in range(90):
-            self.shapes.append(BackgroundShape(screen_width, screen_height))
+        # Shapes share a few pre-rasterized looks; only their positions change, kept in
+        # arrays so all of them move with one vectorized update and draw with one blits()
+        self.rng = np.random.default_rng()
+        self.styles = [BackgroundShape() for _ in range(SHAPE_STYLES)]
+        style = self.rng.integers(0, SHAPE_STYLES, shape_count)
+        self.sprites = np.empty(shape_count, dtype=object)
+        self.sprites[:] = [self.styles[i].sprite for i in style]
+        self.half_size = np.array([s.size // 2 for s in self.styles])[style]
+        self.parallax_coef = self.rng.uniform(0.1, 1.0, shape_count)
+        self.x = self.rng.integers(0, screen_width, shape_count, endpoint=True).astype(np.float64)
+        self.y = self.rng.integers(-screen_height, 0, shape_count, endpoint=True).astype(np.float64)
 
     def update(self, player_y, max_height, scroll_speed, camera_offset):
         # Gradually shift colors over time or based on player position
@@ -43,61 +62,58 @@ class DynamicBackground:
         self.bottom_color.g = int(GRADIENT_BOTTOM_COLOR[1] + (GRADIENT_TOP_COLOR[1] - GRADIENT_BOTTOM_COLOR[1]) * shift_factor)
         self.bottom_color.b = int(GRADIENT_BOTTOM_COLOR[2] + (GRADIENT_TOP_COLOR[2] - GRADIENT_BOTTOM_COLOR[2]) * shift_factor)
         
-        for shape in self.shapes:
-            shape.update(scroll_speed)
+        # Move shapes downward, looping to a random spot above the screen once they exit
+        self.y += scroll_speed * self.parallax_coef
+        wrapped = self.y > self.screen_height
+        count = int(np.count_nonzero(wrapped))
+        if count:
+            self.y[wrapped] = self.rng.integers(-self.screen_height, 0, count, endpoint=True)
+            self.x[wrapped] = self.rng.integers(0, self.screen_width, count, endpoint=True)
+
+    def render_gradient(self):
+        # Interpolate the color of every row at once, as the per-line loop used to
+        top = np.array(self.top_color[:3], dtype=np.float64)
+        bottom = np.array(self.bottom_color[:3], dtype=np.float64)
+        blend_factor = np.arange(self.screen_height)[:, None] / self.screen_height
+        column = (top + (bottom - top) * blend_factor).astype(np.uint8)
+        pygame.surfarray.blit_array(self.gradient_column, column[None])
+        pygame.transform.scale(self.gradient_column, (self.screen_width, self.screen_height), self.gradient)
+        self.gradient_colors = self.top_color[:3] + self.bottom_color[:3]
 
     def render(self, screen):
-        # Draw a vertical gradient
-        for y in range(self.screen_height):
-            # Interpolate color at each vertical pixel
-            blend_factor = y / self.screen_height
-            r = int(self.top_color.r + (self.bottom_color.r - self.top_color.r) * blend_factor)
-            g = int(self.top_color.g + (self.bottom_color.g - self.top_color.g) * blend_factor)
-            b = int(self.top_color.b + (self.bottom_color.b - self.top_color.b) * blend_factor)
+        colors = self.top_color[:3] + self.bottom_color[:3]
+        if self.gradient_colors is None or max(abs(a - b) for a, b in zip(colors, self.gradient_colors)) >= GRADIENT_QUANTUM:
+            self.render_gradient()
+        screen.blit(self.gradient, (0, 0))
 
-            pygame.draw.line(screen, (r, g, b), (0, y), (self.screen_width, y))
-        
-        for shape in self.shapes:
-            shape.render(screen)
+        left = (self.x - self.half_size).astype(int)
+        top = (self.y - self.half_size).astype(int)
+        visible = np.flatnonzero((top < self.screen_height) & (top + 2 * self.half_size >= 0))
+        screen.blits(zip(self.sprites[visible].tolist(), zip(left[visible].tolist(), top[visible].tolist())),
+                     doreturn=False)
+
+@functools.lru_cache(maxsize=None)
+def shape_sprite(shape, size, color):
+    """Alpha sprite of one shape, centered in a size x size surface."""
+    sprite = pygame.Surface((size + 1, size + 1), pygame.SRCALPHA)
+    half = size // 2
+    if shape == "circle":
+        pygame.draw.circle(sprite, color, (half, half), half)
+    elif shape == "square":
+        pygame.draw.rect(sprite, color, (0, 0, size, size))
+    elif shape == "triangle":
+        pygame.draw.polygon(sprite, color, [(half, 0), (0, 2 * half), (2 * half, 2 * half)])
+    return sprite
 
 class BackgroundShape:
-    def __init__(self, screen_width, screen_height):
-        self.screen_width = screen_width
-        self.screen_height = screen_height
-        self.parallax_coef = random.uniform(0.1, 1.0)
-        self.shape = random.choice(["circle", "square", "triangle"])  # Random shape type
-        self.size = random.randint(10, 50)  # Random size
-        self.x = random.randint(0, screen_width)  # Initial x position
-        self.y = random.randint(-screen_height, 0)  # Initial y position
+    """Look of a background shape, pre-rasterized with its alpha into a shared sprite."""
+    def __init__(self, rng=random):
+        self.shape = rng.choice(["circle", "square", "triangle"])  # Random shape type
+        self.size = rng.randint(10, 50)  # Random size
         self.color = (
-            random.randint(50, 150),
-            random.randint(50, 150), 
-            random.randint(50, 150), 
-            random.randint(100, 200),  # Semi-transparent
+            rng.randint(50, 150),
+            rng.randint(50, 150),
+            rng.randint(50, 150),
+            rng.randint(100, 200),  # Semi-transparent
         )
-
-    def update(self, scroll_distance):
-        # Move shape downward, looping to the top if it exits the screen
-        self.y += scroll_distance * self.parallax_coef
-        if self.y > self.screen_height:
-            self.y = random.randint(-self.screen_height, 0)  # Reset above screen
-            self.x = random.randint(0, self.screen_width)  # New random x position
-
-    def render(self, screen):
-        if self.shape == "circle":
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.size // 2)
-        elif self.shape == "square":
-            pygame.draw.rect(
-                screen, self.color, (int(self.x - self.size // 2), int(self.y - self.size // 2), self.size, self.size)
-            )
-        elif self.shape == "triangle":
-            pygame.draw.polygon(
-                screen,
-                self.color,
-                [
-                    (self.x, self.y - self.size // 2),  # Top
-                    (self.x - self.size // 2, self.y + self.size // 2),  # Bottom-left
-                    (self.x + self.size // 2, self.y + self.size // 2),  # Bottom-right
-                ],
-            )
-    
\ No newline at end of file
+        self.sprite = shape_sprite(self.shape, self.size, self.color)
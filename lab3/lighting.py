@@ -0,0 +1,73 @@
+"""Darkness overlay with soft radial lights for the dark mode."""
+from collections import OrderedDict
+
+import pygame
+
+
+class LightingCompositor:
+    """Cuts soft radial lights into one persistent full-screen darkness mask.
+
+    The mask is allocated once. Each frame only the areas lit on the previous
+    frame are filled dark again, and every light blits a cached falloff sprite
+    with BLEND_RGBA_MIN, so overlapping lights combine without extra surfaces.
+    A light is fully clear out to its radius, the same disc the dark-mode
+    platforms show in color, and fades to the mask darkness over the next
+    `softness` * radius. Falloff sprites are cached per radius, rounded to
+    `quantum` pixels, and the least recently used one is dropped once
+    `cache_size` are kept.
+    """
+    def __init__(self, width, height, darkness=220, softness=0.25, quantum=5, cache_size=8):
+        self.darkness = darkness
+        self.softness = softness
+        self.quantum = quantum
+        self.cache_size = cache_size
+        self.mask = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.mask.fill((0, 0, 0, darkness))
+        self.sprites = OrderedDict()
+        self.misses = 0
+        self.lights = []
+        self.lit_rects = []
+
+    def quantize(self, radius):
+        """Radius the light sprite for `radius` is actually drawn with."""
+        return max(self.quantum, int(round(radius / self.quantum)) * self.quantum)
+
+    def light_sprite(self, radius):
+        """Falloff sprite for a light of about `radius`, fully dark at its border."""
+        radius = self.quantize(radius)
+        sprite = self.sprites.get(radius)
+        if sprite is not None:
+            self.sprites.move_to_end(radius)
+            return sprite
+        self.misses += 1
+        # Transparent inside radius, then a linear ramp to the mask darkness at
+        # (1 + softness) * radius, drawn as rings from outside in
+        inner = radius
+        outer = int(radius * (1 + self.softness))
+        sprite = pygame.Surface((2 * outer, 2 * outer), pygame.SRCALPHA)
+        sprite.fill((0, 0, 0, self.darkness))
+        for r in range(outer, inner, -1):
+            alpha = self.darkness * (r - inner) // max(outer - inner, 1)
+            pygame.draw.circle(sprite, (0, 0, 0, alpha), (outer, outer), r)
+        pygame.draw.circle(sprite, (0, 0, 0, 0), (outer, outer), inner)
+        self.sprites[radius] = sprite
+        if len(self.sprites) > self.cache_size:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def add_light(self, position, radius):
+        """Queue a light centered at `position` (screen coordinates) for this frame."""
+        self.lights.append((position, radius))
+
+    def render(self, screen):
+        """Blit the mask with this frame's lights onto `screen` and clear the queue."""
+        for rect in self.lit_rects:
+            self.mask.fill((0, 0, 0, self.darkness), rect)
+        self.lit_rects.clear()
+        for position, radius in self.lights:
+            sprite = self.light_sprite(radius)
+            rect = sprite.get_rect(center=position)
+            self.mask.blit(sprite, rect, special_flags=pygame.BLEND_RGBA_MIN)
+            self.lit_rects.append(rect)
+        self.lights.clear()
+        screen.blit(self.mask, (0, 0))
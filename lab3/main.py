@@ -1,11 +1,17 @@
+import functools
+from collections import deque
 import pygame
 import sys
 import random
 from pygame.locals import *
 import json
 from dynamic_background import DynamicBackground, BackgroundShape
+from lighting import LightingCompositor
 import os
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_profiler import create_profiler
+
 SETTINGS_FILE = "settings/settings.json"
 HIGHSCORE_FILE = "settings/highscore.json"
 
@@ -51,23 +57,84 @@ VERTICAL_SPEED_JUMP_INCREASE = settings["Physics"]["VERTICAL_SPEED_JUMP_INCREASE
 COMBO_TIMEOUT = settings["Game World"]["COMBO_TIMEOUT"]
 DARK_MODE_CHANCE = settings["Game World"]["DARK_MODE_CHANCE"]
 DARK_MODE_DURATION = settings["Game World"]["DARK_MODE_DURATION"]
+PLATFORM_LIGHT_RADIUS = settings["Game World"]["PLATFORM_LIGHT_RADIUS"]  # Light around glowing platforms in dark mode, 0 = off
 
 PLAYER_COLOR = list(map(int, settings["Colors"]["PLAYER_COLOR"]))[:3]
 PLATFORM_COLOR = list(map(int, settings["Colors"]["PLATFORM_COLOR"]))[:3]
 
 
-def create_light_mask(player_pos, radius = 20):
-    light_mask = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    light_mask.fill((0, 0, 0, 220))  # Dark background with slight transparency
-
-    # Draw a transparent circle (light) around the player
-    pygame.draw.circle(light_mask, (0, 0, 0, 0), player_pos, radius)
-
-    return light_mask
+@functools.lru_cache(maxsize=32)
+def platform_surfaces(width, height, color):
+    """Lit and grey dark-mode versions of a platform, drawn once per size and color."""
+    lit = pygame.Surface((width, height), pygame.SRCALPHA)
+    lit.fill((*color, 255))
+    grey = pygame.Surface((width, height))
+    grey.fill((128, 128, 128))
+    return lit, grey
+
+@functools.lru_cache(maxsize=32)
+def light_disc(radius):
+    """Opaque white disc on a transparent square, used as a multiply mask."""
+    disc = pygame.Surface((2 * radius, 2 * radius), pygame.SRCALPHA)
+    disc.fill((255, 255, 255, 0))
+    pygame.draw.circle(disc, (255, 255, 255, 255), (radius, radius), radius)
+    return disc
+
+_lit_scratch = None
+
+def blit_lit_area(screen, lit, rect, center, radius):
+    """Blit the part of `lit` (placed at `rect`) that falls inside the light disc.
+
+    The overlap of the platform and the disc is copied into a reused scratch
+    surface, multiplied by the cached disc and blitted, so the cost is three
+    blits no matter how large the platform or the light is.
+    """
+    global _lit_scratch
+    disc_rect = pygame.Rect(center[0] - radius, center[1] - radius, 2 * radius, 2 * radius)
+    overlap = rect.clip(disc_rect)
+    if not overlap:
+        return
+    if _lit_scratch is None or _lit_scratch.get_width() < overlap.width or _lit_scratch.get_height() < overlap.height:
+        size = (max(overlap.width, 2 * radius), max(overlap.height, PLATFORM_HEIGHT))
+        _lit_scratch = pygame.Surface(size, pygame.SRCALPHA)
+    _lit_scratch.blit(lit, (0, 0), overlap.move(-rect.x, -rect.y))
+    _lit_scratch.blit(light_disc(radius), (disc_rect.x - overlap.x, disc_rect.y - overlap.y),
+                      special_flags=pygame.BLEND_RGBA_MULT)
+    screen.blit(_lit_scratch, overlap.topleft, (0, 0, overlap.width, overlap.height))
+
+TRAIL_ALPHA_STEP = 20  # Each older trail entry is this much more transparent
+TRAIL_VISIBLE = -(-255 // TRAIL_ALPHA_STEP)  # Entries past this are fully transparent
+TRAIL_ANGLE_STEP = 5  # Degrees between pre-rotated trail sprites
+
+@functools.lru_cache(maxsize=None)
+def trail_atlas():
+    """Trail sprites indexed by [color][age][angle], each with the offset of its center.
+
+    A rounded square looks the same after a quarter turn, so angles only cover
+    0-90 degrees in TRAIL_ANGLE_STEP steps.
+    """
+    atlas = {}
+    for color, rgb_color in (("red", PLAYER_COLOR), ("blue", PLATFORM_COLOR)):
+        atlas[color] = []
+        for i in range(TRAIL_VISIBLE):
+            square = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
+            pygame.draw.rect(square, (*rgb_color, 255 - i * TRAIL_ALPHA_STEP), square.get_rect(), border_radius=4)
+            angles = []
+            for angle in range(0, 90, TRAIL_ANGLE_STEP):
+                sprite = pygame.transform.rotate(square, angle) if angle else square
+                angles.append((sprite, sprite.get_width() // 2, sprite.get_height() // 2))
+            atlas[color].append(angles)
+    return atlas
 
 def calculate_light_radius(base_radius, combo):
     return base_radius + combo * 5
 
+def render_profiler_hud(screen, font, profiler):
+    """Draw the profiler percentiles in the top-right corner."""
+    for i, line in enumerate(profiler.hud_lines()):
+        text = font.render(line, True, (255, 255, 255), (0, 0, 0))
+        screen.blit(text, (SCREEN_WIDTH - text.get_width() - 10, 10 + i * 16))
+
 class GameState:
     def __init__(self):
         self.speed_level = 0
@@ -85,17 +152,17 @@ class GameState:
         self.dark_mode_start_time = 0
         
 class Platform:
-    def __init__(self, previous_platform=None, width = BASE_PLATFORM_WIDTH, height = 0):
+    def __init__(self, previous_platform=None, width = BASE_PLATFORM_WIDTH, height = 0, rng = random):
         self.state = "normal"
         self.shake_timer = 0
         self.fall_speed = 0
         self.width = width
         self.height = height
-        self.color = random.choice(["red", "blue"])
+        self.color = rng.choice(["red", "blue"])
     
         
         if previous_platform:
-            x = random.randint(0, SCREEN_WIDTH - width)
+            x = rng.randint(0, SCREEN_WIDTH - width)
             y = previous_platform.rect.y - PLATFORM_SPACING
             self.rect = pygame.Rect(x, y, width, PLATFORM_HEIGHT)
         else:
@@ -115,28 +182,19 @@ class Platform:
             self.fall_speed += 0.2
             self.rect.y += self.fall_speed
         
-    def render(self, screen, camera_offset, player, light_radius, dark_mode):
+    def render(self, screen, camera_offset, player, lights, dark_mode):
         
-        player_pos = (player.rect.centerx, player.rect.centery - camera_offset)
         # Render the platform with it's color
         plat_screen_rect = self.rect.copy()
         plat_screen_rect.y -= camera_offset
 
         if dark_mode:
-            # Loop over the platform's width to determine which parts are lit
-            step = 5  # Granularity of the light check
-            for x in range(plat_screen_rect.left, plat_screen_rect.right, step):
-                for y in range(plat_screen_rect.top, plat_screen_rect.bottom, step):
-                    dist_to_player = ((x - player_pos[0]) ** 2 + (y - player_pos[1]) ** 2) ** 0.5
-                    if dist_to_player <= light_radius:
-                        # Inside the light radius: draw real color
-                        color = PLAYER_COLOR if self.color == "red" else PLATFORM_COLOR
-                    else:
-                        # Outside the light radius: draw gray
-                        color = (128, 128, 128)
-
-                    # Draw the pixel or small block
-                    pygame.draw.rect(screen, color, (x, y, step, step))
+            # Grey platform, with its real color only inside the lights
+            color = PLAYER_COLOR if self.color == "red" else PLATFORM_COLOR
+            lit, grey = platform_surfaces(plat_screen_rect.width, plat_screen_rect.height, tuple(color))
+            screen.blit(grey, plat_screen_rect)
+            for center, radius in lights:
+                blit_lit_area(screen, lit, plat_screen_rect, center, radius)
         else:
             # Normal rendering (no dark mode)
             color = PLAYER_COLOR if self.color == "red" else PLATFORM_COLOR
@@ -161,7 +219,10 @@ class Player:
         self.past_platform = None
         self.max_floor = 0
         self.multi_jump = 0
-        self.trail = []
+        # Only the newest TRAIL_VISIBLE positions can be seen, so the ring buffer keeps
+        # just those; trail_length is the length the speed allows, as before
+        self.trail = deque(maxlen=TRAIL_VISIBLE)
+        self.trail_length = 0
         self.color = "red"
         self.rotation_angle = 0
         self.is_rotating = False
@@ -239,28 +300,30 @@ class Player:
     def update_trail(self):
         # Add the current position to the trail
         self.trail.append((self.rect.centerx, self.rect.centery, self.color))
+        self.trail_length += 1
         # Limit the trail length based on speed
         total_speed = self.velocity.length()
         max_trail_length = int(total_speed ** 2)
-        if len(self.trail) > max_trail_length:
-            self.trail.pop(0)  # Remove the oldest position
+        if self.trail_length > max_trail_length:
+            self.trail_length -= 1  # Remove the oldest position
+            if len(self.trail) > self.trail_length:
+                self.trail.popleft()
             
     def lerp_color(self, color1, color2, t):
         return tuple(int(c1 + (c2 - c1) * t) for c1, c2 in zip(color1, color2))
             
     def render_trail(self, screen, camera_offset):
+        atlas = trail_atlas()
+        angles = 90 // TRAIL_ANGLE_STEP
+        sprites = []
         for i, (x, y, color) in enumerate(reversed(self.trail)):
-            alpha = max(255 - (i * 20), 0)
-            trail_surface = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
-            rgb_color = PLAYER_COLOR if color == "red" else PLATFORM_COLOR
-            pygame.draw.rect(trail_surface, (*rgb_color, alpha), trail_surface.get_rect(), border_radius=4)
-
+            angle = 0
             if self.is_rotating:
                 delayed_rotation = self.rotation_angle - (i * 10)
-                delayed_rotation %= 360
-                trail_surface = pygame.transform.rotate(trail_surface, delayed_rotation)
-            trail_rect = trail_surface.get_rect(center=(x, y - camera_offset))
-            screen.blit(trail_surface, trail_rect.topleft)
+                angle = int((delayed_rotation % 90) / TRAIL_ANGLE_STEP + 0.5) % angles
+            sprite, half_width, half_height = atlas[color][i][angle]
+            sprites.append((sprite, (x - half_width, y - camera_offset - half_height)))
+        screen.blits(sprites, doreturn=False)
 
     
     def render(self, screen, camera_offset):
@@ -287,60 +350,59 @@ class Player:
     def get_max_floor(self):
         return self.max_floor
 
-def main():
-    high_score = load_high_score()
-    pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    clock = pygame.time.Clock()
-    font = pygame.font.Font(None, 36)
-
-    state = GameState()
-
-    # Create initial platforms
-    platforms = [Platform()]  # ground
-    platforms[0].color = "red"
-    for i in range(12):
-        platforms.append(Platform(previous_platform=platforms[-1], height = i + 1))
-
-    player = Player(platforms[0])
-    top_floor = player.get_max_floor()
-    
-    camera_offset = 0
-    previous_camera_offset = 0
-    running = True
-    
-    background = DynamicBackground(SCREEN_WIDTH, SCREEN_HEIGHT)
-        
-    while running:
-        dt_ms = clock.tick(60)
+class InputState:
+    """Controls for one simulation step: held arrow keys and one-shot key presses."""
+    def __init__(self, left=False, right=False, jump=False, switch_color=False):
+        self.left = left
+        self.right = right
+        self.jump = jump
+        self.switch_color = switch_color
+
+class Simulation:
+    """Game logic without display, events or wall-clock time.
+
+    Every random decision goes through `rng` and time only advances by the
+    `dt_ms` passed to step(), so the same seed and input stream always produce
+    the same game.
+    """
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.state = GameState()
+
+        # Create initial platforms
+        self.platforms = [Platform(rng = self.rng)]  # ground
+        self.platforms[0].color = "red"
+        for i in range(12):
+            self.platforms.append(Platform(previous_platform=self.platforms[-1], height = i + 1, rng = self.rng))
+
+        self.player = Player(self.platforms[0])
+        self.top_floor = self.player.get_max_floor()
+
+        self.camera_offset = 0
+        self.time_ms = 0
+        self.frame = 0
+        self.game_over = False
+
+    def step(self, inputs, dt_ms):
+        """Advance the game by dt_ms milliseconds; returns False once the game is over."""
+        state, player = self.state, self.player
         dt = dt_ms / 16.67
-        current_time = pygame.time.get_ticks()
-        
-        scroll_distance = previous_camera_offset - camera_offset
-        previous_camera_offset = camera_offset
-        
-        background.update(player.rect.y, SCREEN_HEIGHT, scroll_distance, camera_offset)
-        background.render(screen)
-            
-        # EVENTS
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
+        self.time_ms += dt_ms
+        self.frame += 1
+        current_time = self.time_ms
+
+        if inputs.jump and player.on_ground:
+            jump_power = BASE_JUMP * (1 + abs(player.velocity.x) * VERTICAL_SPEED_JUMP_INCREASE)
+            player.velocity.y = jump_power
+            player.on_ground = False # Prevents the player from being able to jump mid-air
+        if inputs.switch_color:
+            player.change_color()
 
-            if event.type == KEYDOWN and event.key == K_SPACE and player.on_ground:
-                jump_power = BASE_JUMP * (1 + abs(player.velocity.x) * VERTICAL_SPEED_JUMP_INCREASE)
-                player.velocity.y = jump_power
-                player.on_ground = False # Prevents the player from being able to jump mid-air
-                # Check for Combo
-            elif event.type == KEYDOWN and event.key == K_LCTRL:
-                player.change_color()
-                 
         # INPUT ON GROUND
-        keys = pygame.key.get_pressed()
         if player.on_ground:
-            if keys[K_LEFT]:
+            if inputs.left:
                 player.velocity.x -= ACCELERATION * dt
-            if keys[K_RIGHT]:
+            if inputs.right:
                 player.velocity.x += ACCELERATION * dt
             if player.velocity.x > 0:
                 player.velocity.x -= FRICTION * dt
@@ -348,18 +410,19 @@ def main():
                 player.velocity.x += FRICTION * dt
         else:
             # Mid-air controls: stop horizontal movement if no key is pressed
-            if not keys[K_LEFT] and not keys[K_RIGHT]:
+            if not inputs.left and not inputs.right:
                 if player.velocity.x < 0:
                     player.velocity.x = -1
                 elif player.velocity.x > 0:
                     player.velocity.x = 1
-            if keys[K_LEFT]:
+            if inputs.left:
                 player.velocity.x -= ACCELERATION * 0.5 * dt
-            elif keys[K_RIGHT]:
+            elif inputs.right:
                 player.velocity.x += ACCELERATION * 0.5 * dt
+
         # UPDATE PLAYER
-        just_landed = player.update(platforms, dt)
-        
+        just_landed = player.update(self.platforms, dt)
+
         # Check Combo
         if just_landed:
             jumped_floors = player.multi_jump  # current_platform.height - past_platform.height
@@ -376,7 +439,7 @@ def main():
                 if state.combo > 0:
                     state.score += int(state.combo ** 1.5)
                     state.combo = 0
-                    
+
         if state.combo > 0:
             if (current_time - state.combo_start_time) >= COMBO_TIMEOUT:
                 state.score += int(state.combo ** 1.5)
@@ -385,11 +448,10 @@ def main():
 
         # DARK MODE LOGIC
         if just_landed:
-            if not state.dark_mode and random.random() < DARK_MODE_CHANCE:
+            if not state.dark_mode and self.rng.random() < DARK_MODE_CHANCE:
                 state.dark_mode = True
                 state.dark_mode_start_time = current_time
-        
-        
+
         # Turn off dark mode after 10 seconds
         if state.dark_mode and current_time - state.dark_mode_start_time > DARK_MODE_DURATION:
             state.dark_mode = False
@@ -397,38 +459,37 @@ def main():
         # CAMERA LOGIC
         # 1) Move camera up if player is near top
         desired_offset = player.rect.top - CAMERA_THRESHOLD
-        if desired_offset < camera_offset:
-            camera_offset = desired_offset
+        if desired_offset < self.camera_offset:
+            self.camera_offset = desired_offset
 
         # 2) After floor >= 5, do forced upward scrolling
         current_floor = player.current_platform.height
         if current_floor >= 5:
             forced_speed = state.base_speed + (state.speed_level * 0.5)
-            camera_offset -= forced_speed * dt
-            
+            self.camera_offset -= forced_speed * dt
 
         # SPAWN PLATFORMS ABOVE
-        highest_p = min(platforms, key=lambda p: p.rect.y)
+        highest_p = min(self.platforms, key=lambda p: p.rect.y)
         while highest_p.rect.y > player.rect.y - SCREEN_HEIGHT:
-            newp = Platform(previous_platform=highest_p, width = int(BASE_PLATFORM_WIDTH * state.platform_reduction_ratio), height = highest_p.height + 1)
-            platforms.append(newp)
+            newp = Platform(previous_platform=highest_p, width = int(BASE_PLATFORM_WIDTH * state.platform_reduction_ratio), height = highest_p.height + 1, rng = self.rng)
+            self.platforms.append(newp)
             highest_p = newp
 
         # UPDATE PLATFORMS (Remove platforms that are below screen)
         updated_list = []
-        for p in platforms:
+        for p in self.platforms:
             #p.update(dt)
             # keep if not too far below
-            if p.rect.top < camera_offset + SCREEN_HEIGHT + 100:
+            if p.rect.top < self.camera_offset + SCREEN_HEIGHT + 100:
                 updated_list.append(p)
-        platforms = updated_list
+        self.platforms = updated_list
 
         # SCORING
-        if player.get_max_floor() > top_floor:
-            diff = player.get_max_floor() - top_floor
+        if player.get_max_floor() > self.top_floor:
+            diff = player.get_max_floor() - self.top_floor
             state.score += 10 * diff
-            top_floor = player.get_max_floor()
-            state.total_floors = top_floor
+            self.top_floor = player.get_max_floor()
+            state.total_floors = self.top_floor
 
         # Speed Increase every Xs and platform size decrease
         if current_floor >= 5 and state.speed_level < MAX_SPEED_LEVEL:
@@ -439,22 +500,42 @@ def main():
                     state.platform_reduction_ratio *= PLATFORM_REDUCTION_COEF
 
         # Game Over if below screen
-        if player.rect.bottom - camera_offset > SCREEN_HEIGHT + 10:
-            running = False
-
-        # RENDER
-        # Render Platforms
-        for plat in platforms:
-            plat.render(screen, camera_offset, player = player, light_radius = state.light_radius, dark_mode = state.dark_mode)
-        player_pos = (player.rect.centerx, player.rect.centery - camera_offset)    
+        if player.rect.bottom - self.camera_offset > SCREEN_HEIGHT + 10:
+            self.game_over = True
+        return not self.game_over
+
+def render_frame(screen, sim, font, profiler, lighting):
+    """Draw platforms, lighting, player and HUD for the current simulation state."""
+    state, player, camera_offset = sim.state, sim.player, sim.camera_offset
+    with profiler.scope("platforms"):
+        # Lights of this frame: the player and, only if PLATFORM_LIGHT_RADIUS is set, every
+        # visible glowing platform. Radii are quantized once here, so the colored platform
+        # areas match the cleared mask.
+        lights = []
         if state.dark_mode:
             state.light_radius = calculate_light_radius(100, state.combo)
-            light_mask = create_light_mask(player_pos, state.light_radius)
-            screen.blit(light_mask, (0, 0))
+            player_pos = (player.rect.centerx, player.rect.centery - camera_offset)
+            lights.append((player_pos, lighting.quantize(state.light_radius)))
+            if PLATFORM_LIGHT_RADIUS > 0:
+                platform_radius = lighting.quantize(PLATFORM_LIGHT_RADIUS)
+                for plat in sim.platforms:
+                    center = (plat.rect.centerx, plat.rect.centery - camera_offset)
+                    if plat.color == player.color and -platform_radius < center[1] < SCREEN_HEIGHT + platform_radius:
+                        lights.append((center, platform_radius))
+        # Render Platforms
+        for plat in sim.platforms:
+            plat.render(screen, camera_offset, player = player, lights = lights, dark_mode = state.dark_mode)
+    with profiler.scope("lighting"):
+        if state.dark_mode:
+            for center, radius in lights:
+                lighting.add_light(center, radius)
+            lighting.render(screen)
 
-        # RENDER PLAYER        
+    with profiler.scope("player"):
+        # RENDER PLAYER
         player.render(screen, camera_offset)
-        
+
+    with profiler.scope("hud"):
         # HUD
         font_color = (255, 255, 255)
         # Render background and text
@@ -462,7 +543,64 @@ def main():
         screen.blit(font.render(f"Combo: {state.combo}", True, font_color), (10, 10))
         screen.blit(font.render(f"Dificulty: {state.speed_level}", True, (200, 200, 200)), (10, 50))
 
+def main():
+    high_score = load_high_score()
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 36)
+
+    sim = Simulation()
+    state, player = sim.state, sim.player
+
+    previous_camera_offset = 0
+    running = True
+
+    background = DynamicBackground(SCREEN_WIDTH, SCREEN_HEIGHT)
+    lighting = LightingCompositor(SCREEN_WIDTH, SCREEN_HEIGHT)
+    profiler = create_profiler()  # Enabled with FRAME_PROFILE=1, F3 toggles the overlay
+    hud_font = pygame.font.SysFont("monospace", 14)
+
+    while running:
+        dt_ms = clock.tick(60)
+
+        scroll_distance = previous_camera_offset - sim.camera_offset
+        previous_camera_offset = sim.camera_offset
+
+        with profiler.scope("background"):
+            background.update(player.rect.y, SCREEN_HEIGHT, scroll_distance, sim.camera_offset)
+            background.render(screen)
+
+        with profiler.scope("input"):
+            # EVENTS
+            inputs = InputState()
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    running = False
+
+                if event.type == KEYDOWN and event.key == K_SPACE:
+                    inputs.jump = True
+                elif event.type == KEYDOWN and event.key == K_LCTRL:
+                    inputs.switch_color = True
+                elif event.type == KEYDOWN and event.key == K_F3:
+                    profiler.toggle_hud()
+            keys = pygame.key.get_pressed()
+            inputs.left, inputs.right = keys[K_LEFT], keys[K_RIGHT]
+
+        with profiler.scope("simulation"):
+            if not sim.step(inputs, dt_ms):
+                running = False
+
+        # RENDER
+        render_frame(screen, sim, font, profiler, lighting)
+
+        profiler.count("platform_count", len(sim.platforms))
+        if profiler.hud_visible:
+            render_profiler_hud(screen, hud_font, profiler)
         pygame.display.flip()
+        profiler.end_frame()
+
+    profiler.close()
 
     # Game over
 
@@ -0,0 +1,144 @@
+"""Headless runs of the game simulation for balancing, regression checks and benchmarks.
+
+Run from the lab3 directory (the settings are loaded from settings/):
+
+    python simulate.py --games 100 --policy greedy
+    python simulate.py --render --frames 600      # also draw every frame (SDL dummy driver)
+    python simulate.py --check                    # same seed twice must give the same game
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+
+from main import InputState, Simulation, SCREEN_WIDTH, SCREEN_HEIGHT
+
+FRAME_MS = 1000 / 60  # Simulated time per step, what clock.tick(60) aims for
+
+
+def random_policy(rng):
+    """Mash keys: hold left/right for a while, jump and switch color at random."""
+    held = {"left": False, "right": False}
+
+    def policy(sim):
+        if rng.random() < 0.1:
+            held["left"], held["right"] = rng.choice([(True, False), (False, True), (False, False)])
+        return InputState(held["left"], held["right"],
+                          jump=rng.random() < 0.05, switch_color=rng.random() < 0.02)
+    return policy
+
+
+def greedy_policy(rng):
+    """Steer below the nearest platform above, match its color and jump from the ground."""
+    def policy(sim):
+        player = sim.player
+        above = [p for p in sim.platforms if p.rect.bottom < player.rect.top]
+        if not above:
+            return InputState(jump=player.on_ground)
+        target = max(above, key=lambda p: p.rect.y)
+        dx = target.rect.centerx - player.rect.centerx
+        return InputState(left=dx < -target.rect.width // 4,
+                          right=dx > target.rect.width // 4,
+                          jump=player.on_ground and abs(dx) < target.rect.width and rng.random() < 0.5,
+                          switch_color=player.color != target.color)
+    return policy
+
+
+def scripted_policy(frames):
+    """Replay a list of (left, right, jump, switch_color) tuples, then release all keys."""
+    def policy(sim):
+        if sim.frame < len(frames):
+            return InputState(*frames[sim.frame])
+        return InputState()
+    return policy
+
+
+POLICIES = {"random": random_policy, "greedy": greedy_policy}
+
+
+def state_digest(sim):
+    """Hash of everything the simulation decides; equal digests mean identical games."""
+    h = hashlib.sha1()
+    player, state = sim.player, sim.state
+    h.update(repr((sim.frame, sim.camera_offset, tuple(player.rect), tuple(player.velocity),
+                   player.color, player.max_floor, state.score, state.combo,
+                   state.speed_level, state.dark_mode)).encode())
+    for p in sim.platforms:
+        h.update(repr((tuple(p.rect), p.color, p.height)).encode())
+    return h.hexdigest()
+
+
+class Renderer:
+    """Draws frames into an SDL dummy-driver surface, as the game loop would."""
+    def __init__(self):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame
+        from dynamic_background import DynamicBackground
+        from lighting import LightingCompositor
+        from main import render_frame
+        from frame_profiler import NullProfiler
+        pygame.init()
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.font = pygame.font.Font(None, 36)
+        self.background = DynamicBackground(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.lighting = LightingCompositor(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.render_frame = render_frame
+        self.profiler = NullProfiler()
+        self.previous_camera_offset = 0
+
+    def draw(self, sim):
+        scroll_distance = self.previous_camera_offset - sim.camera_offset
+        self.previous_camera_offset = sim.camera_offset
+        self.background.update(sim.player.rect.y, SCREEN_HEIGHT, scroll_distance, sim.camera_offset)
+        self.background.render(self.screen)
+        self.render_frame(self.screen, sim, self.font, self.profiler, self.lighting)
+
+
+def run_game(seed, policy, max_frames, renderer=None):
+    """Play one game to game over or max_frames; returns the finished Simulation."""
+    sim = Simulation(seed)
+    while sim.frame < max_frames:
+        if renderer is not None:
+            renderer.draw(sim)
+        if not sim.step(policy(sim), FRAME_MS):
+            break
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless game simulation and benchmark")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=3600, help="frame limit per game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, then seed + 1, ...")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--render", action="store_true", help="also draw each frame with the SDL dummy driver")
+    parser.add_argument("--check", action="store_true", help="play every game twice and compare digests")
+    args = parser.parse_args()
+
+    renderer = Renderer() if args.render else None
+    steps, scores, floors = 0, [], []
+    start = time.perf_counter()
+    for game in range(args.games):
+        seed = args.seed + game
+        sim = run_game(seed, POLICIES[args.policy](random.Random(seed)), args.frames, renderer)
+        steps += sim.frame
+        if args.check:
+            again = run_game(seed, POLICIES[args.policy](random.Random(seed)), args.frames)
+            steps += again.frame
+            if state_digest(sim) != state_digest(again):
+                raise SystemExit(f"seed {seed}: simulation is not deterministic")
+        scores.append(sim.state.score)
+        floors.append(sim.player.get_max_floor())
+    elapsed = time.perf_counter() - start
+
+    fps = steps / max(elapsed, 1e-9)
+    print(f"{args.games} games, policy {args.policy}, {'rendered' if args.render else 'no rendering'}"
+          + (", deterministic" if args.check else ""))
+    print(f"{steps} frames in {elapsed:.2f} s: {fps:.0f} simulated frames/s ({fps * FRAME_MS / 1000:.1f}x real time)")
+    print(f"score: mean {sum(scores) / len(scores):.1f}, max {max(scores)}; "
+          f"floor: mean {sum(floors) / len(floors):.1f}, max {max(floors)}")
+
+
+if __name__ == "__main__":
+    main()